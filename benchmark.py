@@ -0,0 +1,372 @@
+import argparse
+import collections
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import types
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import realtime
+from utils.config import load_config, config_controls
+from utils.clock import make_clock
+from utils.detection import make_detector, build_tracker
+from utils.events import EventSink
+from utils.screenshots import ScreenshotWriter
+from utils.track_state import TrackStore
+from utils.backends import load_model, BACKENDS
+
+# --- Configuration ---
+CLIP_DIR = "bench_clips"
+RESULTS_DIR = "bench_results"
+WIDTH, HEIGHT, FPS = 1280, 720, 30
+DURATION_SECONDS = 10
+PIXELS_PER_METER = 40
+LANE_SPEEDS = [4, 8, 12]  # px/frame, one lane each; 4 px/frame at 40 ppm and 30 fps is 10.8 km/h
+LANE_SPACING = 100  # px between lane centres
+VEHICLE_SIZE = (120, 60)
+GAP_FRAMES = 15  # frames between one vehicle leaving a lane and the next entering
+SPEED_FACTOR = 2  # compute_speed multiplies its result by 2; errors are reported with and without it
+STAGES = ("decode", "detect", "track", "speed", "log")
+
+# --- Synthetic clips ---
+
+def lane_layout(speeds, width=WIDTH, height=HEIGHT, fps=FPS, ppm=PIXELS_PER_METER):
+    # Ground truth per lane: even lanes drive right, odd lanes left
+    lanes = []
+    for i, speed in enumerate(speeds):
+        lanes.append({
+            "lane": i,
+            "y": int(height / 2 + (i - (len(speeds) - 1) / 2) * LANE_SPACING),
+            "px_per_frame": speed,
+            "direction": "right" if i % 2 == 0 else "left",
+            "true_kph": round(speed * fps / ppm * 3.6, 3),
+        })
+    return lanes
+
+def vehicle_x(lane, frame_index, width):
+    # Left edge of the lane's vehicle in this frame, or None between vehicles
+    vehicle_width = VEHICLE_SIZE[0]
+    travel = int(np.ceil((width + vehicle_width) / lane["px_per_frame"]))
+    step = frame_index % (travel + GAP_FRAMES)
+    if step >= travel:
+        return None
+    x = -vehicle_width + step * lane["px_per_frame"]
+    return x if lane["direction"] == "right" else width - vehicle_width - x
+
+def make_clip(path, lanes, frames, width=WIDTH, height=HEIGHT, fps=FPS):
+    # Textured grey road (so the tracker's motion compensation has features) with red vehicles
+    rng = np.random.default_rng(0)
+    road = cv2.GaussianBlur(rng.integers(60, 120, (height, width), dtype=np.uint8), (7, 7), 0)
+    background = cv2.cvtColor(road, cv2.COLOR_GRAY2BGR)
+    for lane in lanes[:-1]:
+        y = lane["y"] + LANE_SPACING // 2
+        for x in range(0, width, 80):
+            cv2.line(background, (x, y), (x + 40, y), (220, 220, 220), 3)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for index in range(frames):
+        frame = background.copy()
+        for lane in lanes:
+            x = vehicle_x(lane, index, width)
+            if x is not None:
+                top = lane["y"] - VEHICLE_SIZE[1] // 2
+                cv2.rectangle(frame, (int(x), top), (int(x) + VEHICLE_SIZE[0], top + VEHICLE_SIZE[1]), (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+def synthetic_clip(speeds, duration, width=WIDTH, height=HEIGHT, fps=FPS, ppm=PIXELS_PER_METER):
+    # Generated once per parameter set and reused, so runs compare the same input
+    lanes = lane_layout(speeds, width, height, fps, ppm)
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    name = f"synthetic_{width}x{height}_{fps}fps_{duration}s_{'-'.join(str(s) for s in speeds)}.avi"
+    path = os.path.join(CLIP_DIR, name)
+    if not os.path.exists(path):
+        print(f"🎬 Generating {path}")
+        make_clip(path, lanes, int(duration * fps), width, height, fps)
+    return path, lanes
+
+# --- Stub detector ---
+
+def find_vehicles(frame):
+    # Boxes of the red vehicles; the [x1, y1, x2, y2, conf, cls] rows a YOLO result holds
+    mask = ((frame[:, :, 2] > 180) & (frame[:, :, 1] < 80) & (frame[:, :, 0] < 80)).astype(np.uint8)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    rows = [[x, y, x + w, y + h, 0.9, 2] for x, y, w, h, area in stats[1:count] if area > 200]
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+class StubResult:
+    def __init__(self, frame, rows):
+        import torch
+        from ultralytics.engine.results import Boxes
+        self.boxes = Boxes(torch.from_numpy(rows), frame.shape[:2])  # tensors, as a YOLO result holds
+        self.orig_img = frame
+
+class StubModel:
+    # Stands in for YOLO: finds the synthetic vehicles by colour, so the other stages can be measured
+    # on any CPU without weights. Same predict() interface BatchedDetector uses, and a track() that
+    # keeps its tracker on the predictor like model.track does.
+    names = {2: "car"}
+
+    def __init__(self):
+        self.predictor = types.SimpleNamespace(trackers=[])
+
+    def predict(self, frames, **kwargs):
+        return [StubResult(frame, find_vehicles(frame)) for frame in frames]
+
+    def track(self, frame, persist=True, **kwargs):
+        if not self.predictor.trackers:
+            self.predictor.trackers.append(build_tracker())
+        result = StubResult(frame, find_vehicles(frame))
+        tracks = self.predictor.trackers[0].update(result.boxes.cpu().numpy(), frame)
+        # Like model.track, frames without tracks keep their untracked boxes (no ids)
+        return [StubResult(frame, tracks[:, :7]) if len(tracks) else result]
+
+# --- Instrumentation ---
+
+class Timed:
+    # Proxy that adds the time spent in one method of the wrapped object to a stage total
+    def __init__(self, target, method, stage, seconds):
+        self._target = target
+        self._method = method
+        self._stage = stage
+        self._seconds = seconds
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name != self._method:
+            return attr
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._seconds[self._stage] += time.perf_counter() - started
+        return timed
+
+class ArrivalClock:
+    # Media clock that notes when each frame was released to the pipeline (after any throttling)
+    def __init__(self, clock):
+        self.clock = clock
+        self.arrivals = {}
+
+    def __getattr__(self, name):
+        return getattr(self.clock, name)
+
+    def throttle(self, t):
+        self.clock.throttle(t)
+        self.arrivals[t] = time.perf_counter()
+
+class LatencyTracks(TrackStore):
+    # evict_idle runs once per frame the main loop handles, after its speeds and events: the end of the frame
+    def __init__(self, clock, **kwargs):
+        super().__init__(**kwargs)
+        self.clock = clock
+        self.latencies = []
+
+    def evict_idle(self, now):
+        evicted = super().evict_idle(now)
+        arrived = self.clock.arrivals.pop(now, None)
+        if arrived is not None:
+            self.latencies.append(time.perf_counter() - arrived)
+        return evicted
+
+def percentiles_ms(values):
+    if not values:
+        return None
+    values = np.array(values) * 1000
+    return {"p50": round(float(np.percentile(values, 50)), 2), "p90": round(float(np.percentile(values, 90)), 2),
+            "p99": round(float(np.percentile(values, 99)), 2), "max": round(float(values.max()), 2), "count": len(values)}
+
+# --- Runs ---
+
+def benchmark_controls(lanes, ppm):
+    # Calibration straight from pixels_per_meter, a capture zone covering every lane, and a 0 km/h
+    # trigger so each vehicle logs one event as it crosses the centre
+    controls = config_controls(load_config())
+    controls["use_calibration_lines"].set(False)
+    controls["pixels_per_meter"].set(ppm)
+    controls["speed_limit_kph"].set(0)
+    controls["capture_zone_offset_m"].set(0)
+    controls["capture_zone_height_m"].set((len(lanes) * LANE_SPACING) / ppm)
+    return controls
+
+def run_pass(clip, model, lanes, ppm, queue_size, batch_size, playback_rate, workdir):
+    seconds = collections.defaultdict(float)
+    cap = Timed(realtime.initialize_video_source(clip), "read", "decode", seconds)
+    clock = ArrivalClock(make_clock(cap, clip, playback_rate=playback_rate))
+    # Built as realtime builds it: model.track at batch size 1, where tracking counts as detect time
+    detector = make_detector(Timed(model, "predict" if batch_size > 1 else "track", "detect", seconds), batch_size,
+                             classes=realtime.ALLOWED_CLASSES)
+    if batch_size > 1:
+        detector.tracker = Timed(detector.tracker, "update", "track", seconds)
+    detector.reset()  # the model's own tracker carries over between passes otherwise
+    medians = {}
+    tracks = LatencyTracks(clock, on_finalize=lambda obj_id, summary: medians.__setitem__(obj_id, summary["median_speed"]))
+    screenshots = ScreenshotWriter(directory=workdir)
+    events = EventSink(path=os.path.join(workdir, "events.db"))
+    record_event = realtime.make_event_recorder(screenshots, events, "benchmark")
+    logged = []
+
+    def on_event(frame, box, obj_id, class_name, speed_kph, timestamp, direction, frame_index=None):
+        started = time.perf_counter()
+        record_event(frame, box, obj_id, class_name, speed_kph, timestamp, direction, frame_index)
+        seconds["log"] += time.perf_counter() - started
+        logged.append({"id": int(obj_id), "y": float((box[1] + box[3]) / 2), "speed_kph": speed_kph, "direction": direction})
+
+    controls = benchmark_controls(lanes, ppm)
+    started = time.perf_counter()
+    realtime.main_loop(cap, model, controls, tracks, model.names, None, False, clock, queue_size, detector, on_event)
+    elapsed = time.perf_counter() - started
+    screenshots.close()
+    events.close()
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return {"frames": frames, "seconds": elapsed, "stage_seconds": dict(seconds), "events": logged,
+            "track_medians": medians, "latencies": tracks.latencies}
+
+def stage_report(run):
+    # Per-stage time and throughput; on the single-threaded run whatever isn't decode, detect,
+    # track or log is the main loop's speed/zone/event evaluation. At batch size 1 track has no
+    # time of its own (model.track does both).
+    seconds = dict(run["stage_seconds"])
+    seconds["speed"] = max(run["seconds"] - sum(seconds.get(stage, 0.0) for stage in STAGES if stage != "speed"), 0.0)
+    return {stage: {"seconds": round(seconds.get(stage, 0.0), 4),
+                    "fps": round(run["frames"] / seconds[stage], 1) if seconds.get(stage) else None}
+            for stage in STAGES}
+
+def accuracy_report(run, lanes):
+    # Events matched to lanes by box centre; errors against the lane's true speed
+    by_lane = collections.defaultdict(list)
+    medians = collections.defaultdict(list)
+    for event in run["events"]:
+        lane = min(lanes, key=lambda l: abs(l["y"] - event["y"]))
+        by_lane[lane["lane"]].append(event["speed_kph"])
+        if event["id"] in run["track_medians"]:
+            medians[lane["lane"]].append(run["track_medians"][event["id"]])
+    report, errors, corrected = [], [], []
+    for lane in lanes:
+        measured = np.array(by_lane[lane["lane"]])
+        entry = dict(lane, events=len(measured))
+        if len(measured):
+            error = measured - lane["true_kph"]
+            entry.update({
+                "measured_kph": round(float(measured.mean()), 3),
+                "track_median_kph": round(float(np.mean(medians[lane["lane"]])), 3) if medians[lane["lane"]] else None,
+                "mean_error_kph": round(float(error.mean()), 3),
+                "mean_abs_error_kph": round(float(np.abs(error).mean()), 3),
+                "mean_pct_error": round(float((error / lane["true_kph"]).mean() * 100), 2),
+                "mean_abs_error_without_factor_kph": round(float(np.abs(measured / SPEED_FACTOR - lane["true_kph"]).mean()), 3),
+            })
+            errors.extend(np.abs(error))
+            corrected.extend(np.abs(measured / SPEED_FACTOR - lane["true_kph"]))
+        report.append(entry)
+    return {
+        "speed_factor": SPEED_FACTOR,
+        "lanes": report,
+        "mean_abs_error_kph": round(float(np.mean(errors)), 3) if errors else None,
+        "mean_abs_error_without_factor_kph": round(float(np.mean(corrected)), 3) if corrected else None,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    # Headline numbers against an earlier results file
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"📐 Compared with {baseline_path} ({baseline.get('revision')}):")
+    rows = [("pipeline fps", ("pipeline", "fps")), ("sequential fps", ("sequential", "fps")),
+            ("latency p50 ms", ("latency_ms", "p50")), ("latency p99 ms", ("latency_ms", "p99")),
+            ("abs error km/h", ("accuracy", "mean_abs_error_kph"))]
+    rows += [(f"{stage} fps", ("stages", stage, "fps")) for stage in STAGES]
+    for label, keys in rows:
+        old, new = baseline, results
+        for key in keys:
+            old = old.get(key) if isinstance(old, dict) else None
+            new = new.get(key) if isinstance(new, dict) else None
+        if old is None or new is None:
+            continue
+        change = f" ({(new - old) / old * 100:+.1f}%)" if old else ""
+        print(f"   {label:>16}: {old} → {new}{change}")
+
+def summarize(results):
+    stages = ", ".join(f"{stage} {row['fps']}" for stage, row in results["stages"].items() if row["fps"])
+    print(f"⏱️ Stage fps: {stages}")
+    print(f"🚀 End to end: {results['sequential']['fps']} fps single-threaded, {results['pipeline']['fps']} fps pipelined")
+    latency = results.get("latency_ms")
+    if latency:
+        print(f"⌛ Latency at 1x: p50 {latency['p50']} ms, p90 {latency['p90']} ms, p99 {latency['p99']} ms")
+    accuracy = results["accuracy"]
+    for lane in accuracy["lanes"]:
+        if lane["events"]:
+            print(f"🎯 Lane {lane['lane']}: true {lane['true_kph']} km/h, measured {lane['measured_kph']} km/h "
+                  f"({lane['mean_pct_error']:+.1f}%, {lane['events']} events)")
+        else:
+            print(f"🎯 Lane {lane['lane']}: true {lane['true_kph']} km/h, no events")
+    if accuracy["mean_abs_error_kph"] is not None:
+        print(f"📏 Mean abs error {accuracy['mean_abs_error_kph']} km/h; "
+              f"{accuracy['mean_abs_error_without_factor_kph']} km/h without compute_speed's x{SPEED_FACTOR}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and speed-accuracy benchmark on synthetic clips")
+    parser.add_argument("--model", default="stub", help="'stub' (colour detector, no weights) or a weights file, e.g. yolov8n.pt.")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=realtime.QUEUE_SIZE, help="Pipeline queue size for the pipelined runs.")
+    parser.add_argument("--duration", type=float, default=DURATION_SECONDS, help="Clip length in seconds.")
+    parser.add_argument("--speeds", default=",".join(str(s) for s in LANE_SPEEDS), help="Lane speeds in px/frame.")
+    parser.add_argument("--ppm", type=float, default=PIXELS_PER_METER, help="Calibration, pixels per metre.")
+    parser.add_argument("--no-latency", action="store_true", help="Skip the real-time (1x) run that measures latency.")
+    parser.add_argument("--output", help=f"Results file (default {RESULTS_DIR}/<timestamp>.json).")
+    parser.add_argument("--baseline", help="Earlier results file to compare against.")
+    args = parser.parse_args()
+
+    speeds = [float(s) for s in args.speeds.split(",")]
+    clip, lanes = synthetic_clip(speeds, args.duration, ppm=args.ppm)
+    model = StubModel() if args.model == "stub" else load_model(args.model, args.backend)
+
+    results = {
+        "revision": git_revision(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {"model": args.model, "backend": args.backend, "batch_size": args.batch_size,
+                   "queue_size": args.queue_size, "clip": clip, "width": WIDTH, "height": HEIGHT, "fps": FPS,
+                   "ppm": args.ppm, "duration": args.duration},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        # Single-threaded: stage times add up to the whole run
+        print("🔬 Single-threaded run (per-stage timing)...")
+        sequential = run_pass(clip, model, lanes, args.ppm, 0, args.batch_size, 0.0, workdir)
+        results["stages"] = stage_report(sequential)
+        results["sequential"] = {"frames": sequential["frames"], "seconds": round(sequential["seconds"], 3),
+                                 "fps": round(sequential["frames"] / sequential["seconds"], 1)}
+        results["accuracy"] = accuracy_report(sequential, lanes)
+
+        print("🔬 Pipelined run (throughput)...")
+        pipelined = run_pass(clip, model, lanes, args.ppm, args.queue_size, args.batch_size, 0.0, workdir)
+        results["pipeline"] = {"frames": pipelined["frames"], "seconds": round(pipelined["seconds"], 3),
+                               "fps": round(pipelined["frames"] / pipelined["seconds"], 1)}
+
+        if not args.no_latency:
+            # Frames released at capture rate, so latency isn't just the backlog of an unthrottled read
+            print("🔬 Real-time run (latency)...")
+            live = run_pass(clip, model, lanes, args.ppm, args.queue_size, args.batch_size, 1.0, workdir)
+            results["latency_ms"] = percentiles_ms(live["latencies"])
+
+    summarize(results)
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+    if args.baseline:
+        compare(results, args.baseline)
@@ -1,9 +1,11 @@
 import cv2
 import os
 import time
-from datetime import datetime
-import subprocess
-import threading
+
+from utils.recording import FrameRing, CameraReader, ChunkWriter
+from utils.transcode import TranscodePool
+from utils.jobs import JobStore
+from utils.shm_ring import SharedFrameRing
 
 # --- Configuration ---
 CAMERA_INDEX = 2
@@ -14,6 +16,11 @@ CHUNK_DURATION_MINUTES = 10
 CHUNK_DURATION_SECONDS = CHUNK_DURATION_MINUTES * 60
 TOTAL_DURATION_SECONDS = 60 * 60  # Run for 1 hour
 OUTPUT_DIR = "captures"
+PREVIEW_FPS = 10  # live preview refresh rate; 0 turns the preview off
+PREVIEW_SCALE = 0.5
+TRANSCODE_CODEC = "h264"  # h264 | prores | mjpg (keep the recorded .avi)
+BURN_TIMESTAMP = False  # draw the capture time into each frame (the .frames.bin sidecar is always written)
+SHARED_MEMORY = False  # also publish raw frames for `realtime.py --shm` to process live
 
 # --- Setup ---
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -26,88 +33,44 @@ if not cap.isOpened():
     exit(1)
 
 fourcc = cv2.VideoWriter_fourcc(*"MJPG")
-chunk_index = 1
-start_time = time.time()
-session_start_time = start_time
-
-def new_writer(chunk_index):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"capture_{chunk_index:03d}_{timestamp}.avi"
-    path = os.path.join(OUTPUT_DIR, filename)
-    print(f"📹 Starting new recording: {path}")
-    writer = cv2.VideoWriter(path, fourcc, FPS, (FRAME_WIDTH, FRAME_HEIGHT))
-    return writer, path
-
-def convert_avi_to_mov_and_delete(avi_path):
-    base, _ = os.path.splitext(avi_path)
-    temp_mov_path = base + ".mov.inprogress"
-    final_mov_path = base + ".mov"
-
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", avi_path,
-        "-vcodec", "prores_ks",
-        "-pix_fmt", "yuv422p10le",
-        temp_mov_path
-    ]
-    print(f"🎞️ Converting {avi_path} → {final_mov_path}")
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-        os.rename(temp_mov_path, final_mov_path)
-        os.remove(avi_path)
-        print(f"🗑️ Deleted original: {avi_path}")
-    except subprocess.CalledProcessError:
-        print(f"❌ Failed to convert {avi_path}")
-        if os.path.exists(temp_mov_path):
-            os.remove(temp_mov_path)
-
-# --- Start First Chunk ---
-out, current_avi_path = new_writer(chunk_index)
-
-# --- Recording Loop ---
+session_start_time = time.time()
+
+def register_chunk(path):
+    # Completion signal for the processing side: the chunk is final, queue it as a job
+    store = JobStore()
+    store.add([path])
+    store.close()
+    print(f"📥 Ready for processing: {path}")
+
+transcoder = TranscodePool(TRANSCODE_CODEC, on_done=register_chunk)
+
+# --- Start Reader and Writer ---
+# The reader only drains the camera into the ring; encoding and disk writes happen on the writer
+# thread, so a slow write costs ring slots (counted as dropped frames) instead of camera frames.
+ring = FrameRing()
+shared = None
+if SHARED_MEMORY:
+    shared = SharedFrameRing((int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3))
+    print(f"🔗 Publishing frames to shared memory '{shared.name}'")
+reader = CameraReader(cap, ring, [shared] if shared is not None else [])
+writer = ChunkWriter(ring, OUTPUT_DIR, fourcc, FPS, (FRAME_WIDTH, FRAME_HEIGHT), CHUNK_DURATION_SECONDS,
+                     on_chunk=lambda path, stats: transcoder.submit(path), burn_in=BURN_TIMESTAMP)
+reader.start()
+writer.start()
+
+# --- Preview / Supervision Loop ---
 try:
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("⚠️ Failed to read frame.")
-            break
-
-        # Draw timestamp in upper-right
-        timestamp_text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        (text_width, _), _ = cv2.getTextSize(timestamp_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
-        cv2.putText(
-            frame,
-            timestamp_text,
-            (FRAME_WIDTH - text_width - 10, 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (255, 255, 255),
-            1,
-            cv2.LINE_AA
-        )
-
-        out.write(frame)
-        cv2.imshow("Live Capture", frame)
-
-        if cv2.waitKey(1) == 27:  # ESC key to stop
-            print("⏹️ ESC pressed. Stopping capture.")
-            break
-
-        # Chunk duration check
-        if time.time() - start_time >= CHUNK_DURATION_SECONDS:
-            out.release()
-
-            # # Background conversion
-            # threading.Thread(
-            #     target=convert_avi_to_mov_and_delete,
-            #     args=(current_avi_path,),
-            #     daemon=True
-            # ).start()
-
-            chunk_index += 1
-            out, current_avi_path = new_writer(chunk_index)
-            start_time = time.time()
+    while reader.alive():
+        if PREVIEW_FPS > 0:
+            latest = reader.latest
+            if latest is not None:
+                preview = cv2.resize(latest.frame, None, fx=PREVIEW_SCALE, fy=PREVIEW_SCALE, interpolation=cv2.INTER_AREA)
+                cv2.imshow("Live Capture", preview)
+            if cv2.waitKey(int(1000 / PREVIEW_FPS)) == 27:  # ESC key to stop
+                print("⏹️ ESC pressed. Stopping capture.")
+                break
+        else:
+            time.sleep(0.2)
 
         # Total session time check
         if time.time() - session_start_time >= TOTAL_DURATION_SECONDS:
@@ -118,7 +81,11 @@ except KeyboardInterrupt:
     print("\n⏹️ Capture interrupted by user.")
 
 finally:
+    reader.stop()
+    if shared is not None:
+        shared.close()
+    writer.join()  # drains the ring and closes the last chunk with its stats
     cap.release()
-    out.release()
     cv2.destroyAllWindows()
-    print("✅ Capture finished.")
\ No newline at end of file
+    transcoder.close()
+    print(f"✅ Capture finished: {reader.captured} frames captured, {ring.dropped} dropped.")
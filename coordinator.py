@@ -1,84 +1,328 @@
 import os
+import argparse
+import queue
 import subprocess
 import threading
 import time
+import multiprocessing as mp
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+
+from utils.jobs import JobStore
+from utils.events import EventSink
+from utils.sharding import plan_shards, stitch_shards, discard_screenshots
 
 CAPTURE_DIR = Path("captures")
-PROCESSED_LOG = Path("processed_files.txt")
-LOCK_EXT = ".lock"
+VIDEO_EXTENSIONS = (".avi", ".mov", ".mp4")
 CAPTURE_SCRIPT = "capture.py"
-PROCESS_SCRIPT = "realtime.py"
-MAX_WORKERS = 2
+THREADS_PER_WORKER = 2  # torch threads per worker process
+MAX_WORKERS = max(1, (os.cpu_count() or THREADS_PER_WORKER) // THREADS_PER_WORKER)
+BATCH_SIZE = 8  # frames per detection batch in each processing job
+SHARD_OVERLAP_FRAMES = 60  # tracker warm-up shared by neighbouring shards (~2 s at 30 fps)
+SCREENSHOT_MODE = "full"  # full | crop | context
+BACKEND = "torch"  # torch | onnx | openvino (exported once, cached next to the weights)
+INT8 = False
+ROI_INFERENCE = False  # detect only in the band around the capture zone
+MOTION_GATE = False  # skip detection on frames where nothing moves
+MAX_ATTEMPTS = 2  # a job that crashes its worker this many times is reported as failed
 CHECK_INTERVAL = 5  # seconds
 
 def start_capture():
     print("🎥 Starting capture.py...")
     return subprocess.Popen(["python", CAPTURE_SCRIPT])
 
-def get_processed_files():
-    if PROCESSED_LOG.exists():
-        return set(PROCESSED_LOG.read_text().splitlines())
-    return set()
+def is_file_ready(file):
+    return file.exists()
 
-def mark_as_processed(filename):
-    with PROCESSED_LOG.open("a") as f:
-        f.write(f"{filename}\n")
+# --- WORKER POOL ---
 
-def lock_file(file):
-    lock_path = file.with_suffix(file.suffix + LOCK_EXT)
-    try:
-        lock_path.touch(exist_ok=False)
-        return lock_path
-    except FileExistsError:
-        return None
+def worker_main(worker_id, jobs, results, threads=THREADS_PER_WORKER):
+    # Runs in a child process: pay for torch/ultralytics and the model load once, then take files until told to stop
+    import torch
+    torch.set_num_threads(threads)  # workers share the cores instead of each taking all of them
+    import realtime
+    from utils.config import load_config, config_controls
+    from utils.environment import setup_environment
+    from utils.screenshots import ScreenshotWriter
+    from utils.events import EventSink
+    from utils.backends import load_model
+    from utils.startup import StartupTimer, warm_up
 
-def unlock_file(lock_path):
-    try:
-        lock_path.unlink()
-    except FileNotFoundError:
-        pass
+    timer = StartupTimer()
+    setup_environment()
+    screenshots = ScreenshotWriter(mode=SCREENSHOT_MODE)
+    events = EventSink()
+    timer.mark("writers")
+    model = load_model(realtime.MODEL_PATH, BACKEND, INT8)
+    class_names = model.names
+    timer.mark("model")
+    warm_up(model, realtime.ALLOWED_CLASSES)
+    timer.mark("warm-up")
+    timer.report(f"Worker {worker_id} startup")
+    results.put(("ready", worker_id, None, None))
 
-def is_file_ready(file):
-    return file.exists()
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        try:
+            controls = config_controls(load_config())  # pick up calibration changes between files
+            if "shard" in job:
+                start, end = job["shard"]
+                result = realtime.process_shard(job["path"], model, controls, class_names, start, end,
+                                                SHARD_OVERLAP_FRAMES, BATCH_SIZE, screenshots=screenshots,
+                                                roi=ROI_INFERENCE, motion_gate=MOTION_GATE)
+            else:
+                result = realtime.process_video(job["path"], model, controls, class_names, BATCH_SIZE,
+                                                screenshots=screenshots, events=events, roi=ROI_INFERENCE,
+                                                motion_gate=MOTION_GATE)
+            results.put(("done", worker_id, job["id"], result))
+        except Exception as e:
+            results.put(("failed", worker_id, job["id"], repr(e)))
+    screenshots.close()
+    events.close()
 
-def process_file(file):
-    lock_path = lock_file(file)
-    if not lock_path:
-        return
+class WorkerPool:
+    # Long-lived processing workers, one job at a time each, restarted if they die
+    def __init__(self, size=MAX_WORKERS, on_done=None, on_failed=None):
+        self.size = size
+        self.threads = max(1, (os.cpu_count() or size) // size)
+        self.ctx = mp.get_context("spawn")  # fork and torch threads don't mix
+        self.results = self.ctx.Queue()
+        self.workers = {}   # worker_id -> (process, job queue)
+        self.current = {}   # worker_id -> job being processed
+        self.jobs = {}      # job id -> job
+        self.attempts = {}  # job id -> crash count
+        self.next_id = 0
+        self.pending = []
+        self.on_done = on_done
+        self.on_failed = on_failed
 
-    try:
-        print(f"🧠 Processing: {file}")
-        subprocess.run(["python", PROCESS_SCRIPT, "--video", str(file)], check=True)
-        mark_as_processed(file.name)
-        print(f"✅ Done: {file.name}")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to process {file.name}: {e}")
-    finally:
-        unlock_file(lock_path)
+    def _spawn(self, worker_id):
+        jobs = self.ctx.Queue(maxsize=1)
+        process = self.ctx.Process(target=worker_main, args=(worker_id, jobs, self.results, self.threads), daemon=True)
+        process.start()
+        self.workers[worker_id] = (process, jobs)
 
-def monitor_directory():
-    processed = get_processed_files()
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    def start(self):
+        for worker_id in range(self.size):
+            self._spawn(worker_id)
+
+    def submit(self, path, shard=None):
+        job = {"id": self.next_id, "path": str(path)}
+        if shard is not None:
+            job["shard"] = shard
+        self.next_id += 1
+        self.jobs[job["id"]] = job
+        self.pending.append(job)
+        return job
+
+    def busy(self):
+        return bool(self.pending or self.current)
+
+    def _dispatch(self):
+        for worker_id, (process, jobs) in self.workers.items():
+            if not self.pending:
+                return
+            if worker_id not in self.current and process.is_alive():
+                job = self.pending.pop(0)
+                self.current[worker_id] = job
+                jobs.put(job)
+
+    def _reap(self):
+        for worker_id, (process, _) in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            job = self.current.pop(worker_id, None)
+            print(f"💥 Worker {worker_id} exited ({process.exitcode}), restarting")
+            if job is not None:
+                attempts = self.attempts[job["id"]] = self.attempts.get(job["id"], 0) + 1
+                if attempts < MAX_ATTEMPTS:
+                    self.pending.insert(0, job)
+                else:
+                    self._finish(job["id"], self.on_failed, f"worker crashed {attempts} times")
+            self._spawn(worker_id)
+
+    def poll(self, timeout):
+        # Handle results for up to `timeout` seconds, keeping every live worker busy
+        deadline = time.monotonic() + timeout
         while True:
-            files_to_process = [f for f in sorted(CAPTURE_DIR.glob("*.avi")) if f.name not in processed and is_file_ready(f)]
-            if not files_to_process:
-                print("📭 No new files found. Monitoring complete.")
-                break
+            self._reap()
+            self._dispatch()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                kind, worker_id, job_id, info = self.results.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                continue
+            if kind == "ready":
+                continue
+            self.current.pop(worker_id, None)
+            self._finish(job_id, self.on_done if kind == "done" else self.on_failed, info)
+
+    def _finish(self, job_id, callback, info):
+        job = self.jobs.pop(job_id, None)
+        self.attempts.pop(job_id, None)
+        if job is not None and callback:
+            callback(job, info)
+
+    def shutdown(self):
+        for process, jobs in self.workers.values():
+            if process.is_alive():
+                jobs.put(None)
+        for process, _ in self.workers.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+def count_frames(path):
+    import cv2
+    cap = cv2.VideoCapture(str(path))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return frame_count
 
-            for file in files_to_process:
-                executor.submit(process_file, file)
-                processed.add(file.name)
+class FileTracker:
+    # Turns files into pool jobs (whole-file or sharded) and finishes each file once all its jobs are in.
+    # Each file is split into one frame range per worker, processed in parallel.
+    def __init__(self, workers=MAX_WORKERS, on_complete=None, events=None):
+        self.shards_per_file = workers
+        self.on_complete = on_complete
+        self.events = events  # EventSink for stitched shard events
+        self.files = {}  # path -> {"shards", "results", "failed"}
+        self.pool = WorkerPool(workers, self._job_done, self._job_failed)
 
-            time.sleep(CHECK_INTERVAL)
+    def submit(self, path):
+        path = str(path)
+        shards = plan_shards(count_frames(path), self.shards_per_file, SHARD_OVERLAP_FRAMES) if self.shards_per_file > 1 else []
+        if len(shards) < 2:
+            shards = []
+        self.files[path] = {"shards": shards, "results": {}, "failed": None}
+        for index, shard in enumerate(shards or [None]):
+            job = self.pool.submit(path, shard)
+            job["index"] = index
+
+    def _job_done(self, job, result):
+        entry = self.files[job["path"]]
+        entry["results"][job["index"]] = result
+        self._maybe_complete(job["path"])
+
+    def _job_failed(self, job, error):
+        entry = self.files[job["path"]]
+        entry["failed"] = entry["failed"] or error
+        entry["results"][job["index"]] = None
+        self._maybe_complete(job["path"])
+
+    def _maybe_complete(self, path):
+        entry = self.files[path]
+        if len(entry["results"]) < max(len(entry["shards"]), 1):
+            return
+        del self.files[path]
+        results = [entry["results"][index] for index in sorted(entry["results"])]
+        if entry["failed"] is None and entry["shards"]:
+            kept, dropped = stitch_shards(entry["shards"], results, SHARD_OVERLAP_FRAMES)
+            discard_screenshots(dropped)
+            source = Path(path).name
+            for frame_index, obj_id, class_name, speed_kph, timestamp, shot_path, direction in kept:
+                self.events.write(timestamp, obj_id, class_name, speed_kph, shot_path, direction, source, frame_index)
+            self.events.flush()  # committed before the job is marked done
+        if self.on_complete:
+            self.on_complete(path, results, entry["failed"])
+
+def monitor_directory(single_file=None, workers=MAX_WORKERS):
+    store = JobStore()
+    seen = set()
+    running = {}  # path -> job id
+
+    def on_complete(path, results, error):
+        job_id = running.pop(path)
+        name = Path(path).name
+        if error is not None:
+            store.fail(job_id, error)
+            print(f"❌ Failed to process {name}: {error}")
+            return
+        frames = sum(result["frames"] for result in results)
+        seconds = max(result["seconds"] for result in results)
+        setup = max(result.get("setup", 0.0) for result in results)
+        store.complete(job_id, frames, seconds)
+        fps = frames / seconds if seconds > 0 else 0
+        print(f"✅ Done: {name} ({len(results)} shard(s), {fps:.1f} fps, setup {setup:.2f}s)")
+
+    reclaimed = store.reclaim_orphans()
+    if reclaimed:
+        print(f"♻️ Reclaimed {reclaimed} job(s) left running by an exited coordinator")
+    if single_file is not None:
+        store.add([single_file], reset=True)
+
+    if BACKEND != "torch":
+        # Export once here; workers exporting side by side would race on ultralytics' output paths
+        from realtime import MODEL_PATH
+        from utils.backends import export_model
+        export_model(MODEL_PATH, BACKEND, INT8)
+
+    events = EventSink()
+    tracker = FileTracker(workers, on_complete, events)
+    pool = tracker.pool
+    pool.start()
+    try:
+        while True:
+            if single_file is None:
+                new_files = [f for f in sorted(CAPTURE_DIR.iterdir())
+                             if f.suffix.lower() in VIDEO_EXTENSIONS and f.name not in seen and is_file_ready(f)]
+                seen.update(f.name for f in new_files)
+                store.add(new_files)
+
+            only = Path(single_file).name if single_file is not None else None
+            while len(running) < workers:
+                job = store.claim(only)
+                if job is None:
+                    break
+                if not Path(job["path"]).exists():
+                    store.fail(job["id"], "file missing")
+                    continue
+                running[job["path"]] = job["id"]
+                print(f"🧠 Queued: {job['path']} (attempt {job['attempts']})")
+                tracker.submit(job["path"])
+
+            if not running:
+                # Jobs another coordinator holds are handed out here once their lease expires
+                leased = store.leased_elsewhere(only)
+                if not leased:
+                    print("📭 No new files found. Monitoring complete.")
+                    break
+                print(f"⏳ Waiting on {leased} job(s) leased by another coordinator")
+
+            pool.poll(CHECK_INTERVAL)
+            store.renew(running.values())
+    finally:
+        pool.shutdown()
+        events.close()
+        store.close()
+
+def print_status():
+    store = JobStore()
+    for state, row in sorted(store.summary().items()):
+        fps = f", avg {row['fps']:.1f} fps" if row["fps"] else ""
+        print(f"{state:>8}: {row['jobs']} job(s){fps}")
+    store.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture and process coordinator")
+    parser.add_argument("--video", type=str, help="Process this one file (split across the worker pool) and exit.")
+    parser.add_argument("--status", action="store_true", help="Print job counts by state and exit.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"Processing workers, and shards per file (default {MAX_WORKERS}: one per {THREADS_PER_WORKER} cores).")
+    args = parser.parse_args()
+
     CAPTURE_DIR.mkdir(exist_ok=True)
-    PROCESSED_LOG.touch(exist_ok=True)
 
-    capture_proc = start_capture()
-    print("⏳ Waiting for capture to complete...")
-    capture_proc.wait()
-    print("📦 Capture finished. Starting processing phase...")
-    monitor_directory()
\ No newline at end of file
+    if args.status:
+        print_status()
+    elif args.video:
+        monitor_directory(args.video, args.workers)
+    else:
+        capture_proc = start_capture()
+        print("⏳ Waiting for capture to complete...")
+        capture_proc.wait()
+        print("📦 Capture finished. Starting processing phase...")
+        monitor_directory(workers=args.workers)
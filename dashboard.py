@@ -4,13 +4,170 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.style as mplstyle
+from matplotlib.colors import to_rgba_array
+import io
+import os
+import itertools
+import queue
+import threading
+import numpy as np
 from datetime import datetime
 from matplotlib.lines import Line2D
+import matplotlib.dates as mdates
+import time
+
+from utils.config import load_config
+from utils.environment import CSV_HEADER
+from utils.events import connect
+from utils.rollups import SpeedSummary, query_summary, ensure_rollups, MAX_VALID_SPEED
 
 # Dark theme
 mplstyle.use('dark_background')
 
 CSV_PATH = "speed_log.csv"
+EVENTS_DB = "speed_log.db"
+
+REFRESH_MS = 5000  # how often new events are pulled in
+LOADING_REFRESH_MS = 1000  # ... while the first load is still coming in
+SPEEDER_MAX = 80  # speeders are over the posted limit but not past this
+# Time windows for the statistics and plot, in seconds (None = everything)
+WINDOWS = {"All time": None, "Last 24 hours": 86400, "Last 7 days": 7 * 86400,
+           "Last 30 days": 30 * 86400, "Last year": 365 * 86400}
+# Quartile 1-4, then readings past MAX_VALID_SPEED
+PALETTE = ["lime", "cyan", "lightsalmon", "orange", "hotpink"]
+POINT_BUDGET = 50_000  # above this the scatter is replaced by a density image
+GRID = (1600, 400)  # time x speed cells of the density image, about one per screen pixel
+LOAD_CHUNK = 250_000  # event store rows read per query
+RECENT_BUDGET = 5_000  # new points blitted on top before the whole plot is redrawn
+TIME_PADDING = 0.05  # share of the time span left free on the right for new events
+
+class EventTail:
+    # Reads new events on a background thread, so a large store never blocks the UI: rows past the
+    # last id in the event store, in id ranges of LOAD_CHUNK and only the two plotted columns, or
+    # lines past the last byte offset in the legacy CSV log. poll() hands out what has arrived.
+    def __init__(self, db_path=EVENTS_DB, csv_path=CSV_PATH, interval=REFRESH_MS / 1000):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.interval = interval
+        self.last_id = 0
+        self.offset = 0
+        self.header_read = False
+        self.source = None  # "db" once the store is open and its rollups exist, "csv" for the log
+        self.loading = True  # until the first pass has caught up
+        self.error = None
+        self.chunks = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def poll(self):
+        # [(source, timestamps, speeds), ...] read since the last call; never blocks
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        chunks = []
+        while True:
+            try:
+                chunks.append(self.chunks.get_nowait())
+            except queue.Empty:
+                return chunks
+
+    def _run(self):
+        conn = None
+        while not self.stopped.is_set():
+            caught_up = True
+            try:
+                if os.path.exists(self.db_path):
+                    if conn is None:
+                        conn = connect(self.db_path)
+                        ensure_rollups(conn)  # a store written before rollups existed
+                        self.source = "db"
+                    caught_up = self._read_db(conn)
+                elif os.path.exists(self.csv_path):
+                    self.source = "csv"
+                    self._read_csv()
+            except Exception as e:
+                self.error = e
+            if caught_up:
+                self.loading = False
+                self.stopped.wait(self.interval)
+        if conn is not None:
+            conn.close()
+
+    def _read_db(self, conn):
+        # One id range per call; True once it reaches the newest row
+        newest = conn.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0
+        high = min(self.last_id + LOAD_CHUNK, newest)
+        if high > self.last_id:
+            rows = conn.execute("SELECT timestamp, speed_kph FROM events WHERE id > ? AND id <= ?",
+                                (self.last_id, high))
+            values = np.fromiter(itertools.chain.from_iterable(rows), np.float64).reshape(-1, 2)
+            self.last_id = high
+            if len(values):
+                self.chunks.put(("db", values[:, 0], values[:, 1]))
+        return high >= newest
+
+    def _read_csv(self):
+        with open(self.csv_path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a row still being written waits for the next poll
+        self.offset += end
+        text = data[:end].decode()
+        if not self.header_read and end:
+            # Legacy logs have a 5-column header over 6-field rows, so the header is skipped and the
+            # fixed columns used
+            text = text.partition("\n")[2]
+            self.header_read = True
+        if text.strip():
+            df = pd.read_csv(io.StringIO(text), names=CSV_HEADER, usecols=["timestamp", "speed_kph"])
+            self.chunks.put(("csv", df["timestamp"].to_numpy(dtype=np.float64),
+                             df["speed_kph"].to_numpy(dtype=np.float64)))
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+class EventBuffer:
+    # Event times and speeds for plotting, in arrays that grow by doubling
+    def __init__(self, capacity=1024):
+        self.timestamps = np.empty(capacity)
+        self.speeds = np.empty(capacity)
+        self.size = 0
+
+    def extend(self, timestamps, speeds):
+        n = len(timestamps)
+        if self.size + n > len(self.speeds):
+            capacity = max(len(self.speeds) * 2, self.size + n)
+            for name in ("timestamps", "speeds"):
+                grown = np.empty(capacity)
+                grown[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, grown)
+        self.timestamps[self.size:self.size + n] = timestamps
+        self.speeds[self.size:self.size + n] = speeds
+        self.size += n
+
+def speed_classes(speeds, quartiles):
+    # Palette index per speed: 0-3 by quartile (upper bound inclusive), 4 past MAX_VALID_SPEED
+    classes = np.searchsorted(quartiles, speeds, side="left").astype(np.uint8)
+    classes[speeds > MAX_VALID_SPEED] = 4
+    return classes
+
+def density_image(x, y, limits, quartiles, colors, grid=GRID):
+    # RGBA image of event density over a time x speed grid: each cell gets its speed band's colour,
+    # with opacity following the log of the number of events in it
+    (x0, x1), (y0, y1) = limits
+    cx = ((x - x0) * (grid[0] / max(x1 - x0, 1e-9))).astype(np.int64).clip(0, grid[0] - 1)
+    cy = ((y - y0) * (grid[1] / max(y1 - y0, 1e-9))).astype(np.int64).clip(0, grid[1] - 1)
+    counts = np.bincount(cy * grid[0] + cx, minlength=grid[0] * grid[1]).reshape(grid[1], grid[0])
+    row_speeds = y0 + (np.arange(grid[1]) + 0.5) * (y1 - y0) / grid[1]
+    image = np.repeat(colors[speed_classes(row_speeds, quartiles)][:, None, :], grid[0], axis=1)
+    image[..., 3] = np.where(counts > 0, 0.35 + 0.65 * np.log1p(counts) / np.log1p(max(counts.max(), 1)), 0)
+    return image
+
+def date_numbers(timestamps):
+    # Unix seconds to matplotlib date numbers without building datetime objects
+    return timestamps / 86400.0 + mdates.date2num(np.datetime64("1970-01-01"))
 
 class SpeedDashboard:
     def __init__(self, root):
@@ -28,6 +185,12 @@ class SpeedDashboard:
         )
         self.percent_over_label.pack()
 
+        # Statistics window
+        self.window_var = tk.StringVar(value="All time")
+        self.window_box = ttk.Combobox(self.top_frame, textvariable=self.window_var, values=list(WINDOWS), state="readonly")
+        self.window_box.pack(pady=(5, 0))
+        self.window_box.bind("<<ComboboxSelected>>", self.on_window)
+
         # Main plot frame
         self.plot_frame = ttk.Frame(self.root)
         self.plot_frame.pack(fill=tk.BOTH, expand=True)
@@ -60,87 +223,175 @@ class SpeedDashboard:
         self.figure, self.ax = plt.subplots(figsize=(8, 5))
         self.canvas = FigureCanvasTkAgg(self.figure, master=self.plot_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.speed_limit = load_config()["posted_speed_limit_kph"]
+        self.setup_plot()
+
+        # Only rows added since the last refresh are read. Statistics come from the event store's
+        # rollups; for the CSV log they are a running summary of what has been read.
+        self.tail = EventTail()
+        self.stats_conn = None  # the UI thread's own connection, for rollup queries
+        self.events = EventBuffer()
+        self.summary = SpeedSummary()
 
+        self.refresh()
+
+    def refresh(self):
         self.load_and_plot()
+        self.root.after(LOADING_REFRESH_MS if self.tail.loading else REFRESH_MS, self.refresh)
+
+    def ingest(self):
+        # Appends new events for the plot (and to the running summary when there is no event store);
+        # returns how many there were
+        count = 0
+        for source, timestamps, speeds in self.tail.poll():
+            self.events.extend(timestamps, speeds)
+            if source == "csv":
+                self.summary.merge(SpeedSummary.from_speeds(speeds))
+            count += len(speeds)
+        return count
+
+    def window_start(self):
+        seconds = WINDOWS[self.window_var.get()]
+        return None if seconds is None else time.time() - seconds
+
+    def window_summary(self):
+        start = self.window_start()
+        if self.tail.source == "db":
+            if self.stats_conn is None:
+                self.stats_conn = connect(self.tail.db_path)
+            return query_summary(self.stats_conn, start)
+        if start is None:
+            return self.summary
+        size = self.events.size
+        return SpeedSummary.from_speeds(self.events.speeds[:size][self.events.timestamps[:size] >= start])
+
+    def on_window(self, event=None):
+        self.update_stats()
+        self.redraw()
 
     def load_and_plot(self):
+        # A rolling window moves with the clock, so it is recomputed and redrawn on every tick
+        rolling = WINDOWS[self.window_var.get()] is not None
         try:
-            df = pd.read_csv(CSV_PATH)
+            if not self.ingest() and self.events.size and not rolling:
+                return  # nothing new to draw
+            self.update_stats()
         except Exception as e:
-            self.percent_over_label.config(text=f"⚠️ Error loading CSV: {e}")
+            self.percent_over_label.config(text=f"⚠️ Error loading events: {e}")
             return
 
-        df["datetime"] = pd.to_datetime(df["timestamp"], unit="s")
+        if rolling or not self.blit_recent():
+            self.redraw()
 
-        # Drop suspect speeds for calculations
-        filtered_df = df[df["speed_kph"] <= 90]
-        avg_speed = filtered_df["speed_kph"].mean()
-        std_dev = filtered_df["speed_kph"].std()
-        max_speed = filtered_df["speed_kph"].max()
-        total_vehicles = len(df)
+    def update_stats(self):
+        summary = self.window_summary()
 
-        # Quartile thresholds
-        q1 = filtered_df["speed_kph"].quantile(0.25)
-        q2 = filtered_df["speed_kph"].quantile(0.5)
-        q3 = filtered_df["speed_kph"].quantile(0.75)
+        # Suspect speeds are left out of the mean, max and quartiles
+        avg_speed = summary.mean
+        max_speed = summary.speed_max if summary.speed_max is not None else float("nan")
+        total_vehicles = summary.count
+        self.quartiles = summary.valid_quantiles([0.25, 0.5, 0.75])
 
-        # Count vehicles over speed limit (50 km/h)
-        over_limit_count = df[df["speed_kph"] > 50].shape[0]
+        # Share of vehicles over the speed limit; speeders are over it but not past SPEEDER_MAX
+        over_limit_count = summary.count_between(self.speed_limit)
         percent_over_limit = (over_limit_count / total_vehicles) * 100 if total_vehicles > 0 else 0
-
-        # Count speeders (>50 and ≤80)
-        speeders_count = df[(df["speed_kph"] > 50) & (df["speed_kph"] <= 80)].shape[0]
+        speeders_count = summary.count_between(self.speed_limit, SPEEDER_MAX)
 
         # Update labels
-        self.percent_over_label.config(text=f"🚨 {percent_over_limit:.1f}% of vehicles were over the 50 km/h speed limit")
+        self.percent_over_label.config(text=f"🚨 {percent_over_limit:.1f}% of vehicles were over the {self.speed_limit} km/h speed limit")
         self.avg_speed_label.config(text=f"📊 Avg: {avg_speed:.1f} km/h")
         self.max_speed_label.config(text=f"🚀 Max: {max_speed:.1f} km/h")
         self.total_label.config(text=f"🚗 Total: {total_vehicles}")
         self.speeders_label.config(text=f"🏎️ Speeders: {speeders_count}")
 
-        self.ax.clear()
-
-        # Assign colors by quartile
-        colors = []
-        for speed in df["speed_kph"]:
-            if speed > 90:
-                colors.append("hotpink")
-            elif speed <= q1:
-                colors.append("lime")
-            elif speed <= q2:
-                colors.append("cyan")
-            elif speed <= q3:
-                colors.append("lightsalmon")
-            else:
-                colors.append("orange")
-
-        # Plot scatter
-        self.ax.scatter(df["datetime"], df["speed_kph"], c=colors)
+    def setup_plot(self):
+        # Artists are created once and updated in place. New events go to the animated `recent`
+        # scatter, blitted over a saved background until the next full redraw.
+        self.points = self.ax.scatter(np.empty(0), np.empty(0))
+        self.density = self.ax.imshow(np.zeros((1, 1, 4)), origin="lower", aspect="auto", interpolation="nearest",
+                                      visible=False)
+        self.recent = self.ax.scatter(np.empty(0), np.empty(0), animated=True)
+        self.colors = to_rgba_array(PALETTE)
+        self.quartiles = np.full(3, np.nan)
+        self.drawn = 0  # events covered by the last full redraw
+        self.background = None
 
         # Reference line at speed limit
-        self.ax.axhline(50, color='lime', linestyle='-', linewidth=1.5, label='Speed Limit')
+        self.ax.axhline(self.speed_limit, color='lime', linestyle='-', linewidth=1.5, label='Speed Limit')
 
         # Labels
         self.ax.set_title("Speed Over Time")
         self.ax.set_xlabel("Time")
         self.ax.set_ylabel("Speed (km/h)")
         self.ax.grid(True)
+        self.ax.xaxis_date()
 
         # Custom legend
         legend_elements = [
-            Line2D([0], [0], color='lime', linestyle='-', label='Speed Limit (50 km/h)'),
+            Line2D([0], [0], color='lime', linestyle='-', label=f'Speed Limit ({self.speed_limit} km/h)'),
             Line2D([0], [0], marker='o', color='w', markerfacecolor='lime', label='Q1: ≤ 25%', markersize=10),
             Line2D([0], [0], marker='o', color='w', markerfacecolor='cyan', label='Q2: 25–50%', markersize=10),
             Line2D([0], [0], marker='o', color='w', markerfacecolor='lightsalmon', label='Q3: 50–75%', markersize=10),
             Line2D([0], [0], marker='o', color='w', markerfacecolor='orange', label='Q4: Top 25%', markersize=10),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='hotpink', label='> 90 km/h (Inaccurate)', markersize=10)
+            Line2D([0], [0], marker='o', color='w', markerfacecolor='hotpink', label=f'> {MAX_VALID_SPEED} km/h (Inaccurate)', markersize=10)
         ]
         self.ax.legend(handles=legend_elements, loc="upper left")
 
         self.figure.autofmt_xdate()
-        self.canvas.draw()
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        # Any full draw (a redraw, a resize) refreshes the saved background and repaints the new points
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.recent)
+
+    def blit_recent(self):
+        # Draws the events since the last full redraw on top of the saved background; False when
+        # they don't fit the current axes or there are too many of them
+        new = slice(self.drawn, self.events.size)
+        if self.background is None or not self.drawn or not 0 < self.events.size - self.drawn <= RECENT_BUDGET:
+            return False
+        x = date_numbers(self.events.timestamps[new])
+        y = self.events.speeds[new]
+        (x0, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        if x.min() < x0 or x.max() > x1 or y.min() < y0 or y.max() > y1:
+            return False
+        self.recent.set_offsets(np.column_stack([x, y]))
+        self.recent.set_facecolors(self.colors[speed_classes(y, self.quartiles)])
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.recent)
+        self.canvas.blit(self.ax.bbox)
+        return True
 
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = SpeedDashboard(root)
-    root.mainloop()
\ No newline at end of file
+    def redraw(self):
+        size = self.events.size
+        timestamps, y = self.events.timestamps[:size], self.events.speeds[:size]
+        start = self.window_start()
+        if start is not None:
+            keep = timestamps >= start
+            timestamps, y = timestamps[keep], y[keep]
+        x = date_numbers(timestamps)
+
+        if len(x):
+            span = max(x.max() - x.min(), 1 / 1440)
+            limits = ((x.min() - span * 0.01, x.max() + span * TIME_PADDING), (min(y.min(), 0), max(y.max(), 100) * 1.05))
+            self.ax.set_xlim(*limits[0])
+            self.ax.set_ylim(*limits[1])
+            dense = len(x) > POINT_BUDGET
+            if dense:
+                self.density.set_data(density_image(x, y, limits, self.quartiles, self.colors))
+                self.density.set_extent((limits[0][0], limits[0][1], limits[1][0], limits[1][1]))
+                self.points.set_offsets(np.empty((0, 2)))
+            else:
+                self.points.set_offsets(np.column_stack([x, y]))
+                self.points.set_facecolors(self.colors[speed_classes(y, self.quartiles)])
+            self.density.set_visible(dense)
+        else:
+            # Nothing in the window: clear what an earlier, fuller window left behind
+            self.points.set_offsets(np.empty((0, 2)))
+            self.density.set_visible(False)
+            if start is not None:
+                self.ax.set_xlim(*date_numbers(np.array([start, time.time()])))
+        self.recent.set_offsets(np.empty((0, 2)))
+        self.drawn = size
+        self.canvas.draw()
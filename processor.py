@@ -2,14 +2,14 @@ import cv2
 import time
 import math
 import os
-import csv
 import argparse
 import traceback
 from tkinter import Tk
-from ultralytics import YOLO
 
 from utils.config import load_config, save_config
 from utils.environment import setup_environment, SCREENSHOT_DIR, CSV_PATH
+from utils.events import EventSink
+from utils.backends import load_model, BACKENDS
 from ui.controls import create_controls, update_control_values
 
 MODEL_PATH = "yolov8n.pt"
@@ -49,14 +49,6 @@ def save_screenshot(frame, box, obj_id, class_name, speed_kph):
     cv2.imwrite(path, frame)
     return path, timestamp
 
-def log_to_csv(timestamp, obj_id, class_name, speed_kph, screenshot_path, direction=None):
-    with open(CSV_PATH, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        row = [timestamp, obj_id, class_name, round(speed_kph, 2), screenshot_path]
-        if direction is not None:
-            row.append(direction)
-        writer.writerow(row)
-
 def initialize_video_source(video_path):
     cap = cv2.VideoCapture(video_path if video_path else 4)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
@@ -79,7 +71,7 @@ def read_and_process_frame(cap, last_frame, paused):
         cv2.putText(frame, "PAUSED", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
         return frame, True, last_frame
 
-def main_loop(cap, model, controls, tracker_data, class_names, root, is_live):
+def main_loop(cap, model, controls, tracker_data, class_names, root, is_live, events, source=None):
     last_frame = None
     prev_time = time.time()
 
@@ -198,7 +190,7 @@ def main_loop(cap, model, controls, tracker_data, class_names, root, is_live):
                 # Log people even if not speeding
                 if cls_id == 0 and not data['screenshot_taken'][obj_id]:
                     path, timestamp = save_screenshot(frame, box, obj_id, class_name, speed_kph)
-                    log_to_csv(timestamp, obj_id, class_name, speed_kph, path, direction)
+                    events.write(timestamp, obj_id, class_name, speed_kph, path, direction, source)
                     data['screenshot_taken'][obj_id] = True
                     data['screenshot_finalized'][obj_id] = True
 
@@ -209,7 +201,7 @@ def main_loop(cap, model, controls, tracker_data, class_names, root, is_live):
                         and not data['screenshot_taken'][obj_id]
                         and not data['screenshot_finalized'][obj_id]):
                     path, timestamp = save_screenshot(frame, box, obj_id, class_name, speed_kph)
-                    log_to_csv(timestamp, obj_id, class_name, speed_kph, path, direction)
+                    events.write(timestamp, obj_id, class_name, speed_kph, path, direction, source)
                     data['screenshot_taken'][obj_id] = True
                     data['screenshot_finalized'][obj_id] = True
 
@@ -221,6 +213,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="YOLOv8 Speed Tracker")
     parser.add_argument("--video", type=str, help="Path to a video file. If not provided, webcam or batch mode will be used.")
     parser.add_argument("--batch", action="store_true", help="Process all files in the captures directory.")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference runtime.")
+    parser.add_argument("--int8", action="store_true", help="Use an INT8-quantized export (onnx/openvino).")
+    parser.add_argument("--csv", action="store_true", help=f"Also append events to {CSV_PATH} (the event store is always written).")
     args = parser.parse_args()
 
     setup_environment()
@@ -228,8 +223,9 @@ if __name__ == "__main__":
     root = Tk()
     root.title("Live Calibration")
     controls = create_controls(root, config)
-    model = YOLO(MODEL_PATH)
-    class_names = model.model.names
+    model = load_model(MODEL_PATH, args.backend, args.int8)
+    class_names = model.names
+    events = EventSink(csv_path=CSV_PATH if args.csv else None)
 
     try:
         if args.batch:
@@ -239,7 +235,7 @@ if __name__ == "__main__":
                     print(f"🎞️ Processing: {video_path}")
                     cap = initialize_video_source(video_path)
                     tracker_data = initialize_tracker()
-                    main_loop(cap, model, controls, tracker_data, class_names, root, is_live=False)
+                    main_loop(cap, model, controls, tracker_data, class_names, root, False, events, os.path.basename(video_path))
                     cap.release()
             except KeyboardInterrupt:
                 print("⏹️ Batch processing interrupted by user.")
@@ -247,11 +243,13 @@ if __name__ == "__main__":
             is_live = args.video is None
             cap = initialize_video_source(args.video)
             tracker_data = initialize_tracker()
-            main_loop(cap, model, controls, tracker_data, class_names, root, is_live)
+            main_loop(cap, model, controls, tracker_data, class_names, root, is_live, events,
+                      os.path.basename(args.video) if args.video else "live")
     except Exception as e:
         print("🔥 Error in main loop:", e)
         traceback.print_exc()
     finally:
+        events.close()
         try: save_config(controls)
         except: pass
         try: cap.release()
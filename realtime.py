@@ -1,19 +1,30 @@
 import cv2
-import time
 import math
+import numpy as np
 import os
-import csv
+import time
 import argparse
 import traceback
-from tkinter import Tk
-from ultralytics import YOLO
 
-from utils.config import load_config, save_config
-from utils.environment import setup_environment, SCREENSHOT_DIR, CSV_PATH
-from ui.controls import create_controls, update_control_values
+from utils.config import load_config, save_config, config_controls
+from utils.clock import make_clock
+from utils.pipeline import FramePipeline
+from utils.detection import make_detector, TrackingDetector
+from utils.backends import load_model, BACKENDS
+from utils.startup import StartupTimer, warm_up
+from utils.sharding import ObservingDetector
+from utils.screenshots import ScreenshotWriter, SCREENSHOT_MODES
+from utils.events import EventSink
+from utils.track_state import TrackStore
+from utils.geometry import CalibrationGeometry, OverlayLayer
+from utils.environment import setup_environment, CSV_PATH
+from utils.shm_ring import SharedFrameCapture, SHM_NAME
 
 MODEL_PATH = "yolov8n.pt"
 ALLOWED_CLASSES = [2, 3, 5, 7]  # person, bicycle, car, motorcycle, bus, truck
+QUEUE_SIZE = 8  # frames buffered between pipeline stages
+QUEUE_REPORT_SECONDS = 5
+FPS_REPORT_SECONDS = 1.0
 
 # --- UTILS ---
 
@@ -23,18 +34,8 @@ def initialize_video_source(video_path):
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
     return cap
 
-def initialize_tracker():
-    return {
-        "object_history": {},
-        "max_speeds": {},
-        "screenshot_taken": {},
-        "first_seen": {},
-        "last_updated": {},
-        "screenshot_finalized": {},
-        "box_cache": {},
-        "speed_history": {},
-        "last_time": {}
-    }
+def initialize_tracker(on_finalize=None):
+    return TrackStore(on_finalize=on_finalize)
 
 def compute_speed(prev_center, curr_center, time_elapsed, pixels_per_meter):
     dx = curr_center[0] - prev_center[0]
@@ -47,144 +48,272 @@ def compute_speed(prev_center, curr_center, time_elapsed, pixels_per_meter):
     direction = "right" if dx > 0 else "left"
     return speed_mps * 3.6 * 2, direction  # km/h
 
-def save_screenshot(frame, box, obj_id, class_name, speed_kph):
-    timestamp = int(time.time())
-    filename = f"{class_name}_id{obj_id}_speed{int(speed_kph)}_{timestamp}.jpg"
-    path = os.path.join(SCREENSHOT_DIR, filename)
-    cv2.imwrite(path, frame)
-    return path, timestamp
-
-def log_to_csv(timestamp, obj_id, class_name, speed_kph, screenshot_path, direction=None):
-    with open(CSV_PATH, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        row = [timestamp, obj_id, class_name, round(speed_kph, 2), screenshot_path]
-        if direction is not None:
-            row.append(direction)
-        writer.writerow(row)
+def compute_speeds(prev_centers, curr_centers, time_elapsed, pixels_per_meter):
+    # compute_speed over arrays of centres: (km/h, dx, moved) per row, 0 km/h where the move is too small
+    delta = curr_centers - prev_centers
+    pixel_distance = np.hypot(delta[:, 0], delta[:, 1])
+    moved = (pixel_distance >= 3) & (time_elapsed > 0)
+    speeds = np.zeros(len(delta))
+    speeds[moved] = pixel_distance[moved] / pixels_per_meter / time_elapsed[moved] * 3.6 * 2
+    return speeds, delta[:, 0], moved
+
+def source_name(video_path):
+    return os.path.basename(video_path) if video_path else "live"
+
+def make_event_recorder(screenshots, events, source=None):
+    # Default on_event: queue the screenshot, buffer the row with the path it will be written to
+    def record_event(frame, box, obj_id, class_name, speed_kph, timestamp, direction, frame_index=None):
+        frame_key = None if frame_index is None else (source, frame_index)  # writers are reused across files
+        path = screenshots.submit(frame, frame_key, box, obj_id, class_name, speed_kph, timestamp)
+        events.write(timestamp, obj_id, class_name, speed_kph, path, direction, source, frame_index)
+    return record_event
 
 # --- CORE LOOP ---
 
-def main_loop(cap, model, controls, tracker_data, class_names, root, is_live):
-    last_frame = None
-    prev_time = time.time()
-
-    while True:
-        # UI and pause logic
-        root.update_idletasks()
-        root.update()
-        update_control_values(controls)
-        paused = controls['paused'].get()
-
-        ret, frame = cap.read()
-        if not ret:
-            if not is_live:
-                break
-            continue
-
-        current_time = time.time()
-        frame_fps = 30 if is_live else 1 / (current_time - prev_time)
-        prev_time = current_time
-        cv2.putText(frame, f"FPS: {frame_fps:.1f}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-        # Get settings from UI controls
-        frame_height, frame_width = frame.shape[:2]
-        speed_limit_kph = controls['speed_limit_kph'].get()
-        offset_y = controls['box_offset_y'].get()
-        capture_zone_offset_m = controls['capture_zone_offset_m'].get()
-        capture_zone_height_m = controls['capture_zone_height_m'].get()
-
-        x1 = int(controls['calib_line1_x'].get())
-        x2 = int(controls['calib_line2_x'].get())
-        real_world_m = float(controls['real_world_distance_m'].get())
-        pixel_distance = abs(x2 - x1)
-        use_calib = controls['use_calibration_lines'].get()
-
-        ppm = pixel_distance / real_world_m if use_calib and real_world_m > 0 and pixel_distance > 0 else controls['pixels_per_meter'].get()
-
-        # Draw calibration lines
-        cv2.line(frame, (x1, 0), (x1, frame_height), (0, 255, 255), 1)
-        cv2.line(frame, (x2, 0), (x2, frame_height), (0, 255, 255), 1)
-        cv2.putText(frame, "Calib Line 1", (x1 + 5, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-        cv2.putText(frame, "Calib Line 2", (x2 + 5, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-        cv2.putText(frame, f"PPM: {ppm:.1f}", (10, frame_height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
-        # Capture zone
-        capture_zone_height_px = capture_zone_height_m * ppm
-        offset_px = capture_zone_offset_m * ppm
-        capture_zone_top = int((frame_height - capture_zone_height_px) / 2 + offset_px)
-        capture_zone_bottom = int(capture_zone_top + capture_zone_height_px)
-        center_x = frame_width // 2
-        half_width_px = int(ppm * 0.5)
-
-        cv2.rectangle(frame, (0, capture_zone_top), (frame_width, capture_zone_bottom), (255, 0, 255), 2)
-
-        # Detect and track
-        results = model.track(frame, persist=True)
-        if results[0].boxes.id is None:
-            cv2.imshow("YOLOv8 Speed Tracker", frame)
-            if cv2.waitKey(10) & 0xFF == 27: break
-            continue
-
-        ids = results[0].boxes.id.cpu().numpy()
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        class_ids = results[0].boxes.cls.cpu().numpy()
-
-        for obj_id, box, cls_id in zip(ids, boxes, class_ids):
-            if int(cls_id) not in ALLOWED_CLASSES:
-                continue
+def show_frame(frame, overlay, zone, labels):
+    # Draws the preview on a copy, so frames kept elsewhere (motion gate pre-roll) stay clean;
+    # returns True when Esc is pressed
+    frame = frame.copy()
+    overlay.composite(frame, zone)
+    for label, origin in labels:
+        cv2.putText(frame, label, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    cv2.imshow("YOLOv8 Speed Tracker", frame)
+    return cv2.waitKey(10) & 0xFF == 27
+
+def main_loop(cap, model, controls, tracks, class_names, root=None, is_live=False, clock=None,
+              queue_size=QUEUE_SIZE, detector=None, on_event=None, start_frame=0, end_frame=None):
+    # Without a Tk root we run headless: no UI polling, no preview window
+    headless = root is None
+    clock = clock or make_clock(cap, is_live=is_live)
+    detector = detector or TrackingDetector(model, verbose=not headless, classes=ALLOWED_CLASSES)
+    frames = FramePipeline(cap, clock, detector, is_live, queue_size, start_frame, end_frame)
+    own_screenshots = ScreenshotWriter() if on_event is None else None
+    own_events = EventSink() if on_event is None else None
+    on_event = on_event or make_event_recorder(own_screenshots, own_events)
+    geometry = CalibrationGeometry(controls)
+    # Zone geometry is published to the inference crop and to the motion gate's own band
+    regions = [r for r in (getattr(detector, "roi", None), getattr(detector, "gate_roi", None)) if r is not None]
+    gate = getattr(detector, "gate", None)
+    controller = getattr(detector, "controller", None)
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if width > 0 and height > 0:
+        for region in regions:
+            region.update(geometry.get(width, height))  # before the inference stage sees its first frame
+    overlay = None if headless else OverlayLayer()
+    fps_started, fps_frames = None, 0
+    last_report = time.monotonic()
 
-            x1_box, y1, x2_box, y2 = map(int, box)
-            cx, cy = (x1_box + x2_box) / 2, (y1 + y2) / 2
-            class_name = class_names[int(cls_id)]
-
-            if obj_id not in tracker_data['object_history']:
-                # New object
-                tracker_data['object_history'][obj_id] = (cx, cy)
-                tracker_data['max_speeds'][obj_id] = 0
-                tracker_data['screenshot_taken'][obj_id] = False
-                tracker_data['screenshot_finalized'][obj_id] = False
-                tracker_data['first_seen'][obj_id] = current_time
-                tracker_data['box_cache'][obj_id] = box
-                tracker_data['speed_history'][obj_id] = []
-                tracker_data['last_time'][obj_id] = current_time
+    try:
+        for packet in frames:
+            # UI events; control changes reach the cached geometry through variable traces
+            if not headless:
+                root.update_idletasks()
+                root.update()
+
+            # Capture/media time drives every speed and log timestamp
+            frame = packet.frame
+            current_time = packet.timestamp
+            if controller is not None:
+                lag = clock.lag(current_time)  # None for files read as fast as possible
+                if lag is not None:
+                    controller.record_lag(lag)
+            if overlay is not None:
+                fps_frames += 1
+                if fps_started is None:
+                    fps_started = current_time
+                elif current_time - fps_started >= FPS_REPORT_SECONDS:
+                    overlay.set_status(f"FPS: {fps_frames / (current_time - fps_started):.1f}")
+                    fps_started, fps_frames = current_time, 0
+
+            if queue_size > 0 and time.monotonic() - last_report >= QUEUE_REPORT_SECONDS:
+                depths = frames.depths()
+                print(f"📊 Queue depth: decode {depths['decode']}/{queue_size}, inference {depths['inference']}/{queue_size}")
+                if gate is not None:
+                    print(f"🚦 Motion gate skipped {gate.gated_fraction():.0%} of {gate.frames} frames")
+                last_report = time.monotonic()
+
+            frame_height, frame_width = frame.shape[:2]
+            zone = geometry.get(frame_width, frame_height)
+            ppm = zone["ppm"]
+            speed_limit_kph = zone["speed_limit_kph"]
+            capture_zone_top, capture_zone_bottom = zone["zone_top"], zone["zone_bottom"]
+            center_x, half_width_px = zone["center_x"], zone["half_width_px"]
+            for region in regions:
+                region.update(zone)
+
+            # Detections were produced by the inference stage
+            if packet.detections is None:
+                tracks.evict_idle(current_time)  # tracks still time out while nothing is detected
+                if overlay is not None and show_frame(frame, overlay, zone, []):
+                    break
                 continue
 
-            last_time = tracker_data['last_time'][obj_id]
-            time_elapsed = current_time - last_time
-
-            speed_kph, direction = compute_speed(tracker_data['object_history'][obj_id], (cx, cy), time_elapsed, ppm)
-            tracker_data['object_history'][obj_id] = (cx, cy)
-            tracker_data['last_time'][obj_id] = current_time
-            tracker_data['last_updated'][obj_id] = current_time
-            tracker_data['box_cache'][obj_id] = box
-            tracker_data['max_speeds'][obj_id] = max(tracker_data['max_speeds'][obj_id], speed_kph)
-            tracker_data['speed_history'][obj_id].append(speed_kph)
-
-            label = f"{class_name} ID {obj_id} | {speed_kph:.1f} km/h"
-            cv2.putText(frame, label, (x1_box, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-            # Always log people (cls_id == 0)
-            if int(cls_id) == 0 and not tracker_data['screenshot_taken'][obj_id]:
-                path, timestamp = save_screenshot(frame, box, obj_id, class_name, speed_kph)
-                log_to_csv(timestamp, obj_id, class_name, speed_kph, path, direction)
-                tracker_data['screenshot_taken'][obj_id] = True
-                tracker_data['screenshot_finalized'][obj_id] = True
-
-            # Capture screenshot if speeding in either direction
-            if (speed_kph > speed_limit_kph
-                and capture_zone_top <= cy <= capture_zone_bottom
-                and (center_x - half_width_px) <= cx <= (center_x + half_width_px)
-                and not tracker_data['screenshot_taken'][obj_id]
-                and not tracker_data['screenshot_finalized'][obj_id]):
-                path, timestamp = save_screenshot(frame, box, obj_id, class_name, speed_kph)
-                log_to_csv(timestamp, obj_id, class_name, speed_kph, path, direction)
-                tracker_data['screenshot_taken'][obj_id] = True
-                tracker_data['screenshot_finalized'][obj_id] = True
-
-        # Display
-        cv2.imshow("YOLOv8 Speed Tracker", frame)
-        if cv2.waitKey(10) & 0xFF == 27:
-            break
+            ids, boxes, class_ids = packet.detections
+            class_ids = np.asarray(class_ids, dtype=np.int64)
+            keep = np.isin(class_ids, ALLOWED_CLASSES)
+            ids, class_ids = np.asarray(ids)[keep], class_ids[keep]
+            boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)[keep]
+            pixels = boxes.astype(np.int64)
+            centers = (pixels[:, :2] + pixels[:, 2:]) / 2
+
+            # New tracks only get a slot; the rest are measured against their previous centre
+            slots = tracks.lookup(ids)
+            for i in np.flatnonzero(slots < 0):
+                tracks.add(ids[i], centers[i], boxes[i], current_time)
+            seen = np.flatnonzero(slots >= 0)
+            slots = slots[seen]
+            speeds, dx, moved = compute_speeds(tracks.center[slots], centers[seen], current_time - tracks.last_time[slots], ppm)
+            tracks.update_many(slots, centers[seen], boxes[seen], current_time, speeds)
+
+            cx, cy = centers[seen, 0], centers[seen, 1]
+            in_zone = ((capture_zone_top <= cy) & (cy <= capture_zone_bottom)
+                       & (center_x - half_width_px <= cx) & (cx <= center_x + half_width_px))
+            # Always log people (cls_id == 0); others when speeding in the zone, in either direction
+            fire = ~tracks.fired[slots] & ((class_ids[seen] == 0) | ((speeds > speed_limit_kph) & in_zone))
+
+            for j in np.flatnonzero(fire):
+                i = seen[j]
+                direction = ("right" if dx[j] > 0 else "left") if moved[j] else None
+                on_event(frame, boxes[i], ids[i], class_names[int(class_ids[i])], float(speeds[j]),
+                         int(clock.wall_time(current_time)), direction, packet.index)
+            tracks.fired[slots[fire]] = True
+
+            # Tracks that left the frame give their slot back
+            tracks.evict_idle(current_time)
+
+            # Display; screenshots above were taken from the clean frame
+            if overlay is not None:
+                labels = [(f"{class_names[int(class_ids[i])]} ID {ids[i]} | {speed_kph:.1f} km/h", (int(pixels[i, 0]), int(pixels[i, 1]) - 10))
+                          for i, speed_kph in zip(seen, speeds)]
+                if show_frame(frame, overlay, zone, labels):
+                    break
+    finally:
+        frames.stop()
+        geometry.close()
+        if gate is not None and gate.frames:
+            print(f"🚦 Motion gate skipped {gate.gated} of {gate.frames} frames ({gate.gated_fraction():.0%})")
+        if controller is not None and controller.frames:
+            print(f"⚙️ Adaptive inference: {controller.changes} level changes, "
+                  f"{controller.degraded_fraction():.0%} of frames below full quality")
+        tracks.finalize_all()
+        if own_screenshots is not None:
+            own_screenshots.close()
+            own_events.close()
+
+def process_video(video_path, model, controls, class_names, batch_size=1, queue_size=QUEUE_SIZE, playback_rate=0.0,
+                  screenshots=None, events=None, roi=False, motion_gate=False):
+    # Headless run over one file with fresh tracker state, for long-lived workers that keep the model loaded
+    started = time.monotonic()
+    cap = initialize_video_source(video_path)
+    try:
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        clock = make_clock(cap, video_path, playback_rate=playback_rate)
+        detector = make_detector(model, batch_size, classes=ALLOWED_CLASSES, roi=roi, motion_gate=motion_gate)
+        detector.reset()
+        setup = time.monotonic() - started
+        on_event = None
+        if screenshots is not None and events is not None:
+            on_event = make_event_recorder(screenshots, events, source_name(video_path))
+        main_loop(cap, model, controls, initialize_tracker(), class_names, None, False, clock, queue_size, detector, on_event)
+        if events is not None:
+            events.flush()
+        return {"frames": frame_count, "seconds": time.monotonic() - started, "setup": setup}
+    finally:
+        cap.release()
+
+def process_shard(video_path, model, controls, class_names, start, end, overlap, batch_size=1, queue_size=QUEUE_SIZE,
+                  screenshots=None, roi=False, motion_gate=False):
+    # Frames [start - overlap, start) only warm the tracker up; events and the frame count are for
+    # [start, end), with end None running to the end of the file.
+    # Screenshots are written here, but the event rows go back to the coordinator for stitching.
+    first = max(start - overlap, 0)
+    started = time.monotonic()
+    own_screenshots = screenshots is None
+    screenshots = screenshots or ScreenshotWriter()
+    cap = initialize_video_source(video_path)
+    try:
+        if first > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        clock = make_clock(cap, video_path)
+        ranges = [(first, start)] if end is None else [(first, start), (end - overlap, end)]
+        detector = ObservingDetector(make_detector(model, batch_size, classes=ALLOWED_CLASSES, roi=roi, motion_gate=motion_gate), first, ranges)
+        detector.reset()
+        events = []
+        setup = time.monotonic() - started
+
+        def keep_event(frame, box, obj_id, class_name, speed_kph, timestamp, direction, frame_index):
+            if frame_index < start:
+                return
+            path = screenshots.submit(frame, (video_path, frame_index), box, obj_id, class_name, speed_kph, timestamp)
+            events.append((frame_index, int(obj_id), class_name, float(speed_kph), timestamp, path, direction))
+
+        main_loop(cap, model, controls, initialize_tracker(), class_names, None, False, clock,
+                  queue_size, detector, keep_event, first, end)
+        screenshots.flush()  # the coordinator may delete duplicates as soon as we return
+        return {"events": events, "observations": detector.observations,
+                "frames": detector.next_index - start, "seconds": time.monotonic() - started, "setup": setup}
+    finally:
+        cap.release()
+        if own_screenshots:
+            screenshots.close()
+
+def collect_events(video_path, model, controls, class_names, batch_size=1, queue_size=QUEUE_SIZE):
+    # Headless run that only collects (timestamp, id, class, speed, direction) events; returns (events, fps)
+    events = []
+    collect = lambda frame, box, obj_id, class_name, speed_kph, timestamp, direction, frame_index: events.append(
+        (timestamp, int(obj_id), class_name, round(speed_kph, 2), direction))
+    cap = initialize_video_source(video_path)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    clock = make_clock(cap, video_path)
+    detector = make_detector(model, batch_size, classes=ALLOWED_CLASSES)
+    detector.reset()
+    started = time.monotonic()
+    main_loop(cap, model, controls, initialize_tracker(), class_names, None, False, clock,
+              queue_size, detector, collect)
+    elapsed = time.monotonic() - started
+    cap.release()
+    return events, frame_count / elapsed
+
+def compare_detectors(video_path, model, controls, class_names, batch_size, queue_size=QUEUE_SIZE):
+    # Runs a file through per-frame tracking and batched detection and diffs the logged events
+    runs = []
+    for label, size in (("per-frame", 1), (f"batch={batch_size}", batch_size)):
+        events, fps = collect_events(video_path, model, controls, class_names, size, queue_size)
+        print(f"🔬 {label}: {len(events)} events, {fps:.1f} fps")
+        runs.append(events)
+
+    per_frame, batched = runs
+    only_per_frame = [e for e in per_frame if e not in batched]
+    only_batched = [e for e in batched if e not in per_frame]
+    if not only_per_frame and not only_batched:
+        print("✅ Batched events match the per-frame path")
+        return True
+    print(f"⚠️ {len(only_per_frame)} events only in per-frame run, {len(only_batched)} only in batched run")
+    for event in only_per_frame[:10]:
+        print(f"   per-frame only: {event}")
+    for event in only_batched[:10]:
+        print(f"   batched only:   {event}")
+    return False
+
+def compare_backends(video_path, model, backend, controls, class_names, batch_size=1, queue_size=QUEUE_SIZE):
+    # Benchmarks an exported model against the torch weights on the same file. Track IDs are not
+    # comparable across runtimes, so events match on timestamp, class and direction with speeds within 5%.
+    reference_model = load_model(MODEL_PATH)
+    warm_up(reference_model, ALLOWED_CLASSES)  # the model under test was warmed at startup
+    reference, torch_fps = collect_events(video_path, reference_model, controls, class_names, batch_size, queue_size)
+    events, fps = collect_events(video_path, model, controls, class_names, batch_size, queue_size)
+    unmatched = list(reference)
+    for timestamp, _, class_name, speed_kph, direction in events:
+        for ref in unmatched:
+            if ref[0] == timestamp and ref[2] == class_name and ref[4] == direction and abs(ref[3] - speed_kph) <= 0.05 * max(ref[3], 1.0):
+                unmatched.remove(ref)
+                break
+    matched = len(reference) - len(unmatched)
+    agreement = matched / max(len(reference), len(events)) if reference or events else 1.0
+    print(f"🔬 torch: {len(reference)} events, {torch_fps:.1f} fps")
+    print(f"🔬 {backend}: {len(events)} events, {fps:.1f} fps ({fps / torch_fps:.2f}x)")
+    print(f"{'✅' if agreement == 1.0 else '⚠️'} {matched} matching events, agreement {agreement:.1%}")
+    return {"torch_fps": torch_fps, "fps": fps, "torch_events": len(reference), "events": len(events), "agreement": agreement}
 
 # --- ENTRY POINT ---
 
@@ -192,36 +321,102 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="YOLOv8 Speed Tracker")
     parser.add_argument("--video", type=str, help="Path to a video file.")
     parser.add_argument("--batch", action="store_true", help="Batch process all captures.")
+    parser.add_argument("--shm", nargs="?", const=SHM_NAME, help="Process frames live from capture.py's shared-memory ring (SHARED_MEMORY = True).")
+    parser.add_argument("--headless", action="store_true", help="Run without the control panel or preview window.")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Frames buffered between decode/inference/output stages (0 = single thread).")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per detection batch for files (1 = per-frame model.track).")
+    parser.add_argument("--roi", action="store_true", help="Run detection only on the band around the capture zone.")
+    parser.add_argument("--motion-gate", action="store_true", help="Skip detection on frames where nothing moves in the zone.")
+    parser.add_argument("--latency-budget-ms", type=float, default=0.0, help="Adapt detection stride and imgsz to keep inference under this many ms per frame (0 = off).")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference runtime; onnx/openvino export the weights once and cache them.")
+    parser.add_argument("--int8", action="store_true", help="Use an INT8-quantized export (onnx/openvino).")
+    parser.add_argument("--compare-backend", action="store_true", help="Benchmark --backend against torch on --video (fps, event agreement) and exit.")
+    parser.add_argument("--compare-batch", action="store_true", help="Compare batched and per-frame events for --video and exit.")
+    parser.add_argument("--screenshot-mode", choices=SCREENSHOT_MODES, default="full", help="Full frame, vehicle crop, or downscaled context.")
+    parser.add_argument("--screenshot-format", choices=("jpg", "webp"), default="jpg")
+    parser.add_argument("--screenshot-quality", type=int, default=90)
+    parser.add_argument("--csv", action="store_true", help=f"Also append events to {CSV_PATH} (the event store is always written).")
+    parser.add_argument("--playback-rate", type=float, default=0.0, help="Throttle files to N x real time (0 = as fast as possible).")
     args = parser.parse_args()
+    for flag in ("compare_batch", "compare_backend"):
+        if getattr(args, flag) and not args.video:
+            parser.error(f"--{flag.replace('_', '-')} needs --video")  # a live camera never ends
 
+    timer = StartupTimer()
     setup_environment()
     config = load_config()
-    root = Tk()
-    root.title("Live Calibration")
-    controls = create_controls(root, config)
-    model = YOLO(MODEL_PATH)
-    class_names = model.model.names
+    root = None
+    if args.headless:
+        # Calibration comes straight from the saved config; tkinter is never imported
+        controls = config_controls(config)
+    else:
+        from tkinter import Tk
+        from ui.controls import create_controls
+        root = Tk()
+        root.title("Live Calibration")
+        controls = create_controls(root, config)
+    timer.mark("controls")
+    model = load_model(MODEL_PATH, args.backend, args.int8)  # first import of torch/ultralytics
+    class_names = model.names
+    timer.mark("model")
+    warm_up(model, ALLOWED_CLASSES)  # before any clock starts, so the first speeds aren't skewed
+    timer.mark("warm-up")
+    screenshots = ScreenshotWriter(mode=args.screenshot_mode, image_format=args.screenshot_format,
+                                   quality=args.screenshot_quality)
+    events = EventSink(csv_path=CSV_PATH if args.csv else None)
+    timer.mark("writers")
+    timer.report()
 
     try:
-        if args.batch:
+        if args.compare_backend:
+            compare_backends(args.video, model, args.backend, controls, class_names, args.batch_size, args.queue_size)
+        elif args.compare_batch:
+            compare_detectors(args.video, model, controls, class_names, max(args.batch_size, 2), args.queue_size)
+        elif args.batch:
             video_files = [os.path.join("captures", f) for f in os.listdir("captures") if f.endswith((".mp4", ".mov", ".avi"))]
             for video_path in video_files:
                 cap = initialize_video_source(video_path)
-                tracker_data = initialize_tracker()
-                main_loop(cap, model, controls, tracker_data, class_names, root, is_live=False)
+                clock = make_clock(cap, video_path, playback_rate=args.playback_rate)
+                tracks = initialize_tracker()
+                detector = make_detector(model, args.batch_size, root is not None, ALLOWED_CLASSES, args.roi, args.motion_gate,
+                                         args.latency_budget_ms / 1000)
+                detector.reset()
+                record_event = make_event_recorder(screenshots, events, source_name(video_path))
+                main_loop(cap, model, controls, tracks, class_names, root, False, clock, args.queue_size, detector, record_event)
                 cap.release()
+        elif args.shm:
+            # Frames come straight from the capture process; the stream ends when capture closes the ring
+            cap = SharedFrameCapture(args.shm)
+            clock = make_clock(cap)
+            tracks = initialize_tracker()
+            detector = make_detector(model, 1, root is not None, ALLOWED_CLASSES, args.roi, args.motion_gate,
+                                     args.latency_budget_ms / 1000)
+            record_event = make_event_recorder(screenshots, events, "live")
+            main_loop(cap, model, controls, tracks, class_names, root, False, clock, args.queue_size, detector, record_event)
+            if cap.skipped:
+                print(f"⏭️ Skipped {cap.skipped} frames to keep up with the camera")
         else:
+            is_live = args.video is None
             cap = initialize_video_source(args.video)
-            tracker_data = initialize_tracker()
-            main_loop(cap, model, controls, tracker_data, class_names, root, is_live=(args.video is None))
+            clock = make_clock(cap, args.video, is_live, args.playback_rate)
+            tracks = initialize_tracker()
+            # Batching only helps offline; a live feed keeps per-frame tracking for latency
+            detector = make_detector(model, 1 if is_live else args.batch_size, root is not None, ALLOWED_CLASSES, args.roi,
+                                     args.motion_gate, args.latency_budget_ms / 1000)
+            record_event = make_event_recorder(screenshots, events, source_name(args.video))
+            main_loop(cap, model, controls, tracks, class_names, root, is_live, clock, args.queue_size, detector, record_event)
     except Exception as e:
         traceback.print_exc()
     finally:
-        try: save_config(controls)
-        except: pass
+        screenshots.close()
+        events.close()
+        if root is not None:
+            try: save_config(controls)
+            except: pass
         try: cap.release()
         except: pass
-        try: cv2.destroyAllWindows()
-        except: pass
-        try: root.destroy()
-        except: pass
\ No newline at end of file
+        if root is not None:
+            try: cv2.destroyAllWindows()
+            except: pass
+            try: root.destroy()
+            except: pass
@@ -1,31 +1,23 @@
 import cv2
 import math
 import time
-import csv
 import os
-from ultralytics import YOLO
 import argparse
 
+from utils.backends import load_model, BACKENDS
+from utils.environment import setup_environment, SCREENSHOT_DIR, CSV_PATH
+from utils.events import EventSink
+
 # ---------- Configuration ----------
 MODEL_PATH = "yolov8n.pt"
 SPEED_LIMIT_KPH = 3.0
 PIXELS_PER_METER = 100
 ALLOWED_CLASSES = [0, 1, 2, 3, 5, 7]  # person, bicycle, car, motorcycle, bus, truck
-SCREENSHOT_DIR = "screenshots"
-CSV_PATH = "speed_log.csv"
 SCREENSHOT_TIMEOUT = 3  # seconds in view before fallback capture
 IDLE_TIME_BEFORE_FINALIZE = 1  # seconds since last seen
 
 
 # ---------- Setup ----------
-def setup_environment():
-    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
-    if not os.path.exists(CSV_PATH):
-        with open(CSV_PATH, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["timestamp", "object_id", "class", "speed_kph", "screenshot_path"])
-
-
 def initialize_tracker():
     return {}, {}, {}, {}, {}, {}, {}, {}
 
@@ -52,12 +44,6 @@ def save_screenshot(frame, box, obj_id, class_name, speed_kph):
     return path, timestamp
 
 
-def log_to_csv(timestamp, obj_id, class_name, speed_kph, screenshot_path):
-    with open(CSV_PATH, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow([timestamp, obj_id, class_name, round(speed_kph, 2), screenshot_path])
-
-
 def parse_args():
     parser = argparse.ArgumentParser(description="YOLOv8 Speed Tracker")
     parser.add_argument(
@@ -65,18 +51,23 @@ def parse_args():
         type=str,
         help="Path to a video file. If not provided, webcam will be used."
     )
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference runtime.")
+    parser.add_argument("--int8", action="store_true", help="Use an INT8-quantized export (onnx/openvino).")
+    parser.add_argument("--csv", action="store_true", help=f"Also append events to {CSV_PATH} (the event store is always written).")
     return parser.parse_args()
 
 
 # ---------- Main Loop ----------
-def run_speed_tracker(source=0):
-    model = YOLO(MODEL_PATH)
+def run_speed_tracker(source=0, backend="torch", int8=False, events=None):
+    model = load_model(MODEL_PATH, backend, int8)
+    own_events = EventSink() if events is None else None
+    events = events or own_events
     cap = cv2.VideoCapture(source)
     fps = cap.get(cv2.CAP_PROP_FPS) or 30
 
     # Initialize state trackers
     object_history, max_speeds, screenshot_taken, first_seen, last_updated, screenshot_finalized, box_cache, speed_history = initialize_tracker()
-    class_names = model.model.names
+    class_names = model.names
 
     while True:
         ret, frame = cap.read()
@@ -190,7 +181,8 @@ def run_speed_tracker(source=0):
 
                 if speed_kph > SPEED_LIMIT_KPH and at_center and not screenshot_taken[obj_id] and not screenshot_finalized[obj_id]:
                     screenshot_path, timestamp = save_screenshot(frame, box, obj_id, class_name, speed_kph)
-                    log_to_csv(timestamp, obj_id, class_name, speed_kph, screenshot_path)
+                    events.write(timestamp, obj_id, class_name, speed_kph, screenshot_path,
+                                 source=os.path.basename(source) if isinstance(source, str) else "live")
                     screenshot_taken[obj_id] = True
                     screenshot_finalized[obj_id] = True
 
@@ -200,10 +192,16 @@ def run_speed_tracker(source=0):
 
     cap.release()
     cv2.destroyAllWindows()
+    if own_events is not None:
+        own_events.close()
 
 
 # ---------- Entry Point ----------
 if __name__ == "__main__":
     args = parse_args()
     setup_environment()
-    run_speed_tracker(args.video if args.video else 0)
\ No newline at end of file
+    events = EventSink(csv_path=CSV_PATH if args.csv else None)
+    try:
+        run_speed_tracker(args.video if args.video else 0, args.backend, args.int8, events)
+    finally:
+        events.close()
\ No newline at end of file
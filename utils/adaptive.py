@@ -0,0 +1,104 @@
+# yolo_speed_tracker/utils/adaptive.py
+import collections
+import time
+
+# (detection stride, imgsz) from full quality to cheapest; the controller moves one step at a time
+LEVELS = [(1, 640), (1, 480), (2, 480), (2, 320), (3, 320)]
+WINDOW = 30  # detector calls per decision
+HEADROOM = 0.6  # step back up once the cost (and lag) is under this share of its limit
+LAG_FRAMES = 15  # frames of budget the output stage may run behind the source before quality drops
+
+def innermost(detector):
+    while hasattr(detector, "detector"):
+        detector = detector.detector
+    return detector
+
+class AdaptiveController:
+    # Keeps the inference cost per input frame (averaged over WINDOW calls, so skipped frames
+    # count as free) inside the budget by stepping through LEVELS. The main loop also reports how
+    # far behind the source it is handling frames: when anything downstream (preview, screenshots,
+    # event sink) stalls the pipeline, detection can be under budget while frames pile up.
+    def __init__(self, budget_s, levels=LEVELS, window=WINDOW, lag_frames=LAG_FRAMES):
+        self.budget_s = budget_s
+        self.lag_limit = budget_s * lag_frames
+        self.levels = levels
+        self.level = 0
+        self.samples = collections.deque(maxlen=window)
+        self.lags = collections.deque(maxlen=window)
+        self.frames = 0
+        self.degraded_frames = 0
+        self.changes = 0
+
+    @property
+    def stride(self):
+        return self.levels[self.level][0]
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][1]
+
+    def record_lag(self, seconds):
+        # Called from the main loop for each frame of a real-time source
+        self.lags.append(seconds)
+
+    def record(self, seconds, frames):
+        # seconds spent detecting over `frames` input frames; returns True when the level changed
+        self.frames += frames
+        if self.level > 0:
+            self.degraded_frames += frames
+        self.samples.append((seconds, frames))
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        cost = sum(s for s, _ in self.samples) / sum(f for _, f in self.samples)
+        lags = list(self.lags)
+        lag = sum(lags) / len(lags) if lags else 0.0
+        if (cost > self.budget_s or lag > self.lag_limit) and self.level < len(self.levels) - 1:
+            self.level += 1
+        elif cost < self.budget_s * HEADROOM and lag < self.lag_limit * HEADROOM and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self.samples.clear()  # judge the new level on its own samples
+        self.lags.clear()
+        self.changes += 1
+        print(f"⚙️ Inference {cost * 1000:.1f} ms/frame vs {self.budget_s * 1000:.0f} ms budget, "
+              f"lag {lag * 1000:.0f} ms: stride {self.stride}, imgsz {self.imgsz}")
+        return True
+
+    def degraded_fraction(self):
+        return self.degraded_frames / self.frames if self.frames else 0.0
+
+class AdaptiveDetector:
+    # Runs the wrapped detector on every stride-th frame at the controller's imgsz; the frames in
+    # between get None detections, so speeds are measured between the frames actually detected,
+    # using their own timestamps.
+    def __init__(self, detector, budget_s):
+        self.detector = detector
+        self.controller = AdaptiveController(budget_s)
+        self.base = innermost(detector)
+        self.base.imgsz = self.controller.imgsz
+        self.count = 0
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def __call__(self, frames):
+        stride = self.controller.stride
+        picked = []
+        for i in range(len(frames)):
+            if self.count % stride == 0:
+                picked.append(i)
+            self.count += 1
+        started = time.perf_counter()
+        results = self.detector([frames[i] for i in picked]) if picked else []
+        elapsed = time.perf_counter() - started
+        detections = [None] * len(frames)
+        for i, result in zip(picked, results):
+            detections[i] = result
+        if self.controller.record(elapsed, len(frames)):
+            self.base.imgsz = self.controller.imgsz
+        return detections
+
+    def reset(self):
+        self.detector.reset()
+        self.count = 0
@@ -0,0 +1,52 @@
+# yolo_speed_tracker/utils/backends.py
+import hashlib
+import os
+import shutil
+
+BACKENDS = ("torch", "onnx", "openvino")
+EXPORT_IMGSZ = 640
+
+def weights_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def cached_export_path(weights, backend, int8=False):
+    # Exports sit next to the weights, named after their content hash so a new .pt is re-exported
+    stem, _ = os.path.splitext(weights)
+    suffix = ".onnx" if backend == "onnx" else "_openvino_model"
+    return f"{stem}-{weights_digest(weights)}{'-int8' if int8 else ''}{suffix}"
+
+def quantize_onnx(source, target):
+    # ultralytics only quantizes OpenVINO exports; ONNX gets ONNX Runtime's dynamic INT8 weights
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+
+def export_model(weights, backend, int8=False, imgsz=EXPORT_IMGSZ):
+    from ultralytics import YOLO
+    target = cached_export_path(weights, backend, int8)
+    if os.path.exists(target):
+        return target
+    print(f"📦 Exporting {weights} to {backend}{' (INT8)' if int8 else ''}, cached as {target}")
+    # dynamic shapes keep batched detection, ROI crops and adaptive imgsz working
+    exported = YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=True,
+                                    int8=int8 and backend == "openvino", verbose=False)
+    staging = f"{target}.{os.getpid()}.tmp"
+    if backend == "onnx" and int8:
+        quantize_onnx(exported, staging)
+        os.remove(exported)
+    else:
+        shutil.move(exported, staging)
+    os.replace(staging, target)  # a half-written export is never picked up as the cache
+    return target
+
+def load_model(weights, backend="torch", int8=False):
+    # Same YOLO interface (predict/track/names) whichever runtime runs the network
+    from ultralytics import YOLO
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "torch":
+        return YOLO(weights)
+    return YOLO(export_model(weights, backend, int8), task="detect")
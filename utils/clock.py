@@ -0,0 +1,150 @@
+# yolo_speed_tracker/utils/clock.py
+import os
+import re
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# capture.py names chunks capture_NNN_YYYYmmdd_HHMMSS.avi
+CAPTURE_STAMP_PATTERN = re.compile(r"(\d{8}_\d{6})")
+# ...and next to each chunk <base>.frames.bin: (monotonic, wall) capture time of every frame written
+FRAME_TIMES_SUFFIX = ".frames.bin"
+FRAME_TIMES_DTYPE = np.dtype([("mono", "<f8"), ("wall", "<f8")])
+
+def frame_times_path(video_path):
+    return os.path.splitext(video_path)[0] + FRAME_TIMES_SUFFIX
+
+def has_frame_times(video_path):
+    try:
+        return os.path.getsize(frame_times_path(video_path)) >= FRAME_TIMES_DTYPE.itemsize
+    except OSError:
+        return False
+
+def recording_start(video_path, fps=None, frame_count=None):
+    # Best guess at the wall-clock time of the first frame of a file
+    match = CAPTURE_STAMP_PATTERN.search(os.path.basename(video_path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            pass
+    try:
+        duration = frame_count / fps if fps and frame_count and frame_count > 0 else 0
+        return os.path.getmtime(video_path) - duration
+    except OSError:
+        return time.time()
+
+class LiveClock:
+    # Monotonic timestamps taken as each frame comes off the camera
+    def __init__(self):
+        self.wall_origin = time.time()
+        self.mono_origin = time.monotonic()
+
+    def stamp(self, cap, frame_index):
+        return time.monotonic() - self.mono_origin
+
+    def wall_time(self, t):
+        return self.wall_origin + t
+
+    def throttle(self, t):
+        pass
+
+    def lag(self, t):
+        # Seconds since frame t came off the camera
+        return time.monotonic() - self.mono_origin - t
+
+class StampedClock:
+    # Times the capture process recorded as each frame came off the camera (cap.frame_time),
+    # so speeds don't depend on how long frames waited in the shared ring
+    def __init__(self):
+        self.wall_origin = None
+        self.mono_origin = None
+
+    def stamp(self, cap, frame_index):
+        mono, wall = cap.frame_time
+        if self.mono_origin is None:
+            self.mono_origin, self.wall_origin = mono, wall
+        return mono - self.mono_origin
+
+    def wall_time(self, t):
+        return self.wall_origin + t
+
+    def throttle(self, t):
+        pass
+
+    def lag(self, t):
+        # Seconds since the capture process stamped frame t (same monotonic clock on one machine)
+        return time.monotonic() - self.mono_origin - t
+
+class MediaClock:
+    # Timestamps from the media itself, so speeds don't depend on how fast we process
+    def __init__(self, cap, video_path=None, playback_rate=0.0):
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 30.0
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        self.wall_origin = recording_start(video_path, self.fps, frame_count) if video_path else time.time()
+        self.playback_rate = playback_rate  # 0 = as fast as possible, 1.0 = real time
+        self.last_t = -1.0
+        self.started = None
+
+    def stamp(self, cap, frame_index):
+        # Prefer the container timestamp, fall back to frame index / fps when the backend doesn't report one
+        pos = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        t = pos if pos > self.last_t else max(frame_index / self.fps, self.last_t)
+        self.last_t = t
+        return t
+
+    def wall_time(self, t):
+        return self.wall_origin + t
+
+    def throttle(self, t):
+        if self.playback_rate <= 0:
+            return
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now - t / self.playback_rate
+        delay = self.started + t / self.playback_rate - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def lag(self, t):
+        # Seconds behind the playback schedule; None when files run as fast as possible
+        if self.playback_rate <= 0 or self.started is None:
+            return None
+        return time.monotonic() - self.started - t / self.playback_rate
+
+class SidecarClock(MediaClock):
+    # Capture times recorded per frame by capture.py, so speeds and event times are exact however
+    # much later the chunk is processed. Frames past the end of the sidecar continue at the media fps.
+    def __init__(self, cap, video_path, playback_rate=0.0):
+        super().__init__(cap, video_path, playback_rate)
+        times = np.fromfile(frame_times_path(video_path), dtype=FRAME_TIMES_DTYPE)
+        self.offsets = times["mono"] - times["mono"][0]
+        self.walls = times["wall"]
+        self.wall_origin = self.walls[0]
+
+    def stamp(self, cap, frame_index):
+        if frame_index < len(self.offsets):
+            t = self.offsets[frame_index]
+        else:
+            t = self.offsets[-1] + (frame_index - len(self.offsets) + 1) / self.fps
+        t = max(t, self.last_t)
+        self.last_t = t
+        return float(t)
+
+    def wall_time(self, t):
+        # Interpolated between recorded wall times, so a clock step during the chunk is kept
+        if t <= self.offsets[-1]:
+            return float(np.interp(t, self.offsets, self.walls))
+        return float(self.walls[-1] + t - self.offsets[-1])
+
+def make_clock(cap, video_path=None, is_live=False, playback_rate=0.0):
+    if hasattr(cap, "frame_time"):
+        return StampedClock()
+    if is_live:
+        return LiveClock()
+    if video_path and has_frame_times(video_path):
+        return SidecarClock(cap, video_path, playback_rate)
+    return MediaClock(cap, video_path, playback_rate)
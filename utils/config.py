@@ -12,7 +12,8 @@ DEFAULT_CONFIG = {
     "calib_line2_x": 300,
     "real_world_distance_m": 1.0,
     "capture_zone_offset_m": 0.5,
-    "capture_zone_height_m": 1.0
+    "capture_zone_height_m": 1.0,
+    "posted_speed_limit_kph": 50  # the road's limit, for statistics; speed_limit_kph is the capture trigger
 }
 
 def load_config():
@@ -28,6 +29,34 @@ def load_config():
 
     return config
 
+class ConfigValue:
+    # Stand-in for a Tk variable so headless runs can share the UI code paths
+    def __init__(self, value):
+        self.value = value
+        self.callbacks = []
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        for callback in list(self.callbacks):
+            callback()
+
+    def trace_add(self, mode, callback):
+        # Only "write" traces exist here; returns a handle for trace_remove like Tk does
+        self.callbacks.append(callback)
+        return callback
+
+    def trace_remove(self, mode, callback):
+        self.callbacks.remove(callback)
+
+def config_controls(config):
+    controls = {key: ConfigValue(value) for key, value in config.items()}
+    controls['use_calibration_lines'] = ConfigValue(True)
+    controls['paused'] = ConfigValue(False)
+    return controls
+
 def save_config(controls):
     keys_to_save = {
         "pixels_per_meter",
@@ -38,10 +67,12 @@ def save_config(controls):
         "calib_line2_x",
         "real_world_distance_m",
         "capture_zone_offset_m",
-        "capture_zone_height_m"
+        "capture_zone_height_m",
+        "posted_speed_limit_kph"
     }
 
-    data = {}
+    # Keys without a control (e.g. edited by hand) keep their saved value
+    data = {key: value for key, value in load_config().items() if key in keys_to_save}
 
     for key in keys_to_save:
         var = controls.get(key)
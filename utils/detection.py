@@ -0,0 +1,152 @@
+# yolo_speed_tracker/utils/detection.py
+TRACK_CONF = 0.1  # model.track's default; trackers want the low-confidence boxes too
+TRACKER_CONFIG = "botsort.yaml"  # model.track's default tracker
+ROI_MARGIN_M = 2.0  # band kept above and below the capture zone so whole vehicles stay in view
+
+def model_options(imgsz=None):
+    # Extra model call arguments; only what was set, so the model keeps its own defaults otherwise
+    return {"imgsz": imgsz} if imgsz else {}
+
+def track_objects(model, frame, verbose=False, classes=None, imgsz=None):
+    results = model.track(frame, persist=True, verbose=verbose, classes=classes, **model_options(imgsz))
+    boxes = results[0].boxes
+    if boxes.id is None:
+        return None
+    return boxes.id.cpu().numpy(), boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy()
+
+_tracker_configs = {}  # parsed tracker YAML, so per-file jobs don't re-read it
+
+def build_tracker(tracker_config=TRACKER_CONFIG):
+    # Same tracker model.track would attach, but owned by us so it can be fed separately
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace
+    cfg = _tracker_configs.get(tracker_config)
+    if cfg is None:
+        from ultralytics.utils.checks import check_yaml
+        try:
+            from ultralytics.utils import YAML
+            cfg = IterableSimpleNamespace(**YAML.load(check_yaml(tracker_config)))
+        except ImportError:
+            from ultralytics.utils import yaml_load
+            cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_config)))
+        _tracker_configs[tracker_config] = cfg
+    tracker = TRACKER_MAP[cfg.tracker_type](args=cfg)
+    tracker.reset()
+    return tracker
+
+class RegionOfInterest:
+    # Horizontal band around the capture zone that inference is limited to. The main loop
+    # publishes each new zone geometry; the inference stage reads the band once per batch.
+    def __init__(self, margin_m=ROI_MARGIN_M):
+        self.margin_m = margin_m
+        self.zone = None
+        self.band = None  # (top, bottom) rows, None = whole frame
+
+    def update(self, zone):
+        if zone is self.zone:
+            return
+        self.zone = zone
+        margin = int(self.margin_m * zone["ppm"])
+        top = max(zone["zone_top"] - margin, 0)
+        bottom = min(zone["zone_bottom"] + margin, zone["height"])
+        self.band = (top, bottom) if bottom > top else None
+
+    def crop(self, frames):
+        # (cropped frames, row offset to add back to their boxes)
+        band = self.band
+        if band is None:
+            return frames, 0
+        top, bottom = band
+        return [frame[top:bottom] for frame in frames], top
+
+def shift_detections(detections, offset):
+    # Crop coordinates back to full-frame coordinates
+    if not offset:
+        return detections
+    shifted = []
+    for result in detections:
+        if result is not None:
+            ids, boxes, class_ids = result
+            boxes = boxes.copy()
+            boxes[:, [1, 3]] += offset
+            result = (ids, boxes, class_ids)
+        shifted.append(result)
+    return shifted
+
+def reset_model_tracker(model):
+    predictor = getattr(model, "predictor", None)
+    for tracker in getattr(predictor, "trackers", None) or []:
+        tracker.reset()
+
+def advance_trackers(trackers, frames):
+    # Frames the tracker never saw still count toward its lost-track timeout
+    for tracker in trackers:
+        tracker.frame_id += frames
+
+class TrackingDetector:
+    # One model.track call per frame, tracker state lives inside the model
+    def __init__(self, model, verbose=False, classes=None, roi=None):
+        self.model = model
+        self.verbose = verbose
+        self.classes = classes
+        self.roi = roi
+        self.imgsz = None
+        self.batch_size = 1
+
+    def __call__(self, frames):
+        frames, offset = self.roi.crop(frames) if self.roi is not None else (frames, 0)
+        return shift_detections([track_objects(self.model, frame, self.verbose, self.classes, self.imgsz) for frame in frames],
+                                offset)
+
+    def advance(self, frames):
+        advance_trackers(getattr(getattr(self.model, "predictor", None), "trackers", None) or [], frames)
+
+    def reset(self):
+        reset_model_tracker(self.model)
+
+class BatchedDetector:
+    # Detection runs on batches of frames, then the tracker is fed the results one frame at a time, in order
+    def __init__(self, model, batch_size=8, tracker_config=TRACKER_CONFIG, classes=None, roi=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.classes = classes
+        self.roi = roi
+        self.imgsz = None
+        self.tracker = build_tracker(tracker_config)
+
+    def __call__(self, frames):
+        frames, offset = self.roi.crop(frames) if self.roi is not None else (frames, 0)
+        results = self.model.predict(frames, conf=TRACK_CONF, batch=len(frames), classes=self.classes, verbose=False,
+                                     **model_options(self.imgsz))
+        detections = []
+        for result in results:
+            # Rows are [x1, y1, x2, y2, track_id, score, cls, det_index]
+            tracks = self.tracker.update(result.boxes.cpu().numpy(), result.orig_img)
+            if len(tracks) == 0:
+                detections.append(None)
+                continue
+            detections.append((tracks[:, 4], tracks[:, :4], tracks[:, 6]))
+        return shift_detections(detections, offset)
+
+    def advance(self, frames):
+        advance_trackers([self.tracker], frames)
+
+    def reset(self):
+        self.tracker.reset()
+
+def make_detector(model, batch_size=1, verbose=False, classes=None, roi=False, motion_gate=False, latency_budget=0.0):
+    # roi=True limits inference to the band around the capture zone (see RegionOfInterest);
+    # motion_gate=True skips inference on frames where nothing moves (see utils.motion);
+    # latency_budget (seconds per frame) adapts stride and imgsz to stay within it (see utils.adaptive)
+    roi = RegionOfInterest() if roi else None
+    if batch_size > 1:
+        detector = BatchedDetector(model, batch_size, classes=classes, roi=roi)
+    else:
+        detector = TrackingDetector(model, verbose, classes, roi)
+    if motion_gate:
+        from .motion import GatedDetector
+        detector = GatedDetector(detector)
+    if latency_budget > 0:
+        from .adaptive import AdaptiveDetector
+        detector = AdaptiveDetector(detector, latency_budget)
+    return detector
@@ -0,0 +1,156 @@
+# yolo_speed_tracker/utils/events.py
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from .environment import EVENTS_DB, CSV_HEADER
+from .rollups import SCHEMA as ROLLUP_SCHEMA, update_rollups, ensure_rollups
+
+FLUSH_BATCH = 256
+FLUSH_SECONDS = 1.0
+FLUSH_NOW = "flush"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    object_id INTEGER,
+    class TEXT NOT NULL,
+    speed_kph REAL NOT NULL,
+    direction TEXT,
+    screenshot_path TEXT,
+    source TEXT,
+    frame_index INTEGER
+);
+CREATE INDEX IF NOT EXISTS events_time ON events (timestamp);
+CREATE INDEX IF NOT EXISTS events_class_time ON events (class, timestamp);
+CREATE INDEX IF NOT EXISTS events_speed ON events (speed_kph);
+CREATE INDEX IF NOT EXISTS events_source_time ON events (source, timestamp);
+"""
+
+INSERT = ("INSERT INTO events (timestamp, object_id, class, speed_kph, direction, screenshot_path, source, frame_index) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+def connect(path=EVENTS_DB):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA + ROLLUP_SCHEMA)
+    return conn
+
+class EventSink:
+    # write() only queues the row; a background thread commits batches by size or age.
+    # csv_path additionally appends the same rows to a CSV log.
+    def __init__(self, path=EVENTS_DB, csv_path=None, batch_size=FLUSH_BATCH, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.csv_path = csv_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue()
+        self.written = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, timestamp, obj_id, class_name, speed_kph, screenshot_path, direction=None, source=None, frame_index=None):
+        self.queue.put((timestamp, int(obj_id), class_name, round(float(speed_kph), 2), direction,
+                        screenshot_path, source, frame_index))
+
+    def _commit(self, conn, rows):
+        # IMMEDIATE: rollups are read-modify-write, so concurrent sinks queue up instead of racing
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(INSERT, rows)
+            update_rollups(conn, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if self.csv_path:
+            new_file = not os.path.exists(self.csv_path)
+            with open(self.csv_path, mode="a", newline="") as file:
+                writer = csv.writer(file)
+                if new_file:
+                    writer.writerow(CSV_HEADER)
+                writer.writerows([row[0], row[1], row[2], row[3], row[5], row[4]] for row in rows)
+        self.written += len(rows)
+
+    def _run(self):
+        conn = connect(self.path)
+        ensure_rollups(conn)
+        rows, deadline = [], None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # the oldest buffered row has waited long enough
+            if item is None:
+                self._flush_rows(conn, rows)
+                self.queue.task_done()
+                break
+            if item == FLUSH_NOW:
+                self.queue.task_done()
+                item = False
+            elif item is not False:
+                rows.append(item)
+                deadline = deadline or time.monotonic() + self.flush_seconds
+            if rows and (item is False or len(rows) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush_rows(conn, rows)
+                rows, deadline = [], None
+        conn.close()
+
+    def _flush_rows(self, conn, rows):
+        if rows:
+            try:
+                self._commit(conn, rows)
+            except Exception as e:
+                print(f"⚠️ Failed to write {len(rows)} events: {e}")
+        for _ in rows:
+            self.queue.task_done()
+
+    def flush(self):
+        # Commits whatever is buffered and blocks until it is on disk
+        self.queue.put(FLUSH_NOW)
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+def query_events(path=EVENTS_DB, start=None, end=None, classes=None, min_speed=None, max_speed=None,
+                 source=None, columns="*", limit=None):
+    # Range query over the indexed columns; start/end are epoch seconds
+    clauses, args = [], []
+    for clause, value in (("timestamp >= ?", start), ("timestamp < ?", end), ("speed_kph >= ?", min_speed),
+                          ("speed_kph <= ?", max_speed), ("source = ?", source)):
+        if value is not None:
+            clauses.append(clause)
+            args.append(value)
+    if classes:
+        clauses.append(f"class IN ({', '.join('?' * len(classes))})")
+        args.extend(classes)
+    sql = f"SELECT {columns} FROM events"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY timestamp"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    conn = connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(sql, args)]
+    finally:
+        conn.close()
+
+def export_csv(csv_path, path=EVENTS_DB, **filters):
+    rows = query_events(path, **filters)
+    with open(csv_path, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        for row in rows:
+            writer.writerow([row["timestamp"], row["object_id"], row["class"], row["speed_kph"],
+                             row["screenshot_path"], row["direction"]])
+    return len(rows)
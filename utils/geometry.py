@@ -0,0 +1,106 @@
+# yolo_speed_tracker/utils/geometry.py
+import cv2
+import numpy as np
+
+# Controls the derived geometry depends on; a write to any of them invalidates the cache
+WATCHED_CONTROLS = ("pixels_per_meter", "speed_limit_kph", "calib_line1_x", "calib_line2_x",
+                    "real_world_distance_m", "capture_zone_offset_m", "capture_zone_height_m", "use_calibration_lines")
+
+class CalibrationGeometry:
+    # ppm, speed limit and capture-zone bounds, read from the controls only after one of them changes.
+    # Works with Tk variables and with ConfigValue, both of which support trace_add.
+    def __init__(self, controls):
+        self.controls = controls
+        self.cache = {}  # (width, height) -> geometry dict
+        self.traces = []
+        for key in WATCHED_CONTROLS:
+            var = controls.get(key)
+            if var is not None:
+                self.traces.append((var, var.trace_add("write", self.invalidate)))
+
+    def invalidate(self, *args):
+        self.cache.clear()
+
+    def get(self, width, height):
+        geometry = self.cache.get((width, height))
+        if geometry is None:
+            geometry = self.cache[(width, height)] = self._compute(width, height)
+        return geometry
+
+    def _compute(self, width, height):
+        controls = self.controls
+        x1 = int(controls['calib_line1_x'].get())
+        x2 = int(controls['calib_line2_x'].get())
+        real_world_m = float(controls['real_world_distance_m'].get())
+        pixel_distance = abs(x2 - x1)
+        use_calib = controls['use_calibration_lines'].get()
+        ppm = pixel_distance / real_world_m if use_calib and real_world_m > 0 and pixel_distance > 0 else controls['pixels_per_meter'].get()
+
+        capture_zone_height_px = controls['capture_zone_height_m'].get() * ppm
+        offset_px = controls['capture_zone_offset_m'].get() * ppm
+        zone_top = int((height - capture_zone_height_px) / 2 + offset_px)
+        return {
+            "width": width,
+            "height": height,
+            "ppm": ppm,
+            "speed_limit_kph": controls['speed_limit_kph'].get(),
+            "calib_x": (x1, x2),
+            "zone_top": zone_top,
+            "zone_bottom": int(zone_top + capture_zone_height_px),
+            "center_x": width // 2,
+            "half_width_px": int(ppm * 0.5),
+        }
+
+    def close(self):
+        for var, name in self.traces:
+            var.trace_remove("write", name)
+        self.traces = []
+
+def render_layer(width, height, draw):
+    # Sparse premultiplied layer for whatever draw(image) paints on a black canvas: flat pixel
+    # indices, colour and inverse alpha. Every colour used has a 255 channel, so the brightest
+    # channel of an anti-aliased pixel is its coverage.
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    draw(image)
+    flat = image.reshape(-1, 3)
+    index = np.flatnonzero(flat.any(axis=1))
+    color = flat[index].astype(np.uint16)
+    inverse_alpha = 255 - color.max(axis=1, keepdims=True)
+    return index, color, inverse_alpha
+
+class OverlayLayer:
+    # Calibration lines, PPM and capture zone rendered once per geometry, plus a status line
+    # (FPS) rendered only when its text changes. composite() blends just the covered pixels.
+    def __init__(self):
+        self.geometry = None
+        self.layer = None
+        self.status = None
+
+    def set_status(self, text):
+        if self.status != text:
+            self.status = text
+            self.layer = None
+
+    def _render(self, geometry):
+        x1, x2 = geometry["calib_x"]
+        width, height = geometry["width"], geometry["height"]
+
+        def draw(image):
+            cv2.line(image, (x1, 0), (x1, height), (0, 255, 255), 1)
+            cv2.line(image, (x2, 0), (x2, height), (0, 255, 255), 1)
+            cv2.putText(image, "Calib Line 1", (x1 + 5, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            cv2.putText(image, "Calib Line 2", (x2 + 5, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            cv2.putText(image, f"PPM: {geometry['ppm']:.1f}", (10, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            cv2.rectangle(image, (0, geometry["zone_top"]), (width, geometry["zone_bottom"]), (255, 0, 255), 2)
+            if self.status:
+                cv2.putText(image, self.status, (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+        return render_layer(width, height, draw)
+
+    def composite(self, frame, geometry):
+        if self.layer is None or geometry is not self.geometry:
+            self.geometry = geometry
+            self.layer = self._render(geometry)
+        index, color, inverse_alpha = self.layer
+        pixels = frame.reshape(-1, 3)
+        pixels[index] = pixels[index] * inverse_alpha // 255 + color
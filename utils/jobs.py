@@ -0,0 +1,168 @@
+# yolo_speed_tracker/utils/jobs.py
+import os
+import socket
+import sqlite3
+import time
+
+JOBS_DB = "jobs.db"
+LEGACY_PROCESSED_LOG = "processed_files.txt"
+LEASE_SECONDS = 120  # running jobs are renewed while alive; an expired lease is handed out again
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    frames INTEGER,
+    seconds REAL,
+    fps REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+"""
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def pid_alive(pid):
+    if os.name == "nt":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+class JobStore:
+    # pending -> running (leased) -> done | failed, with retries back to pending
+    def __init__(self, path=JOBS_DB, owner=None):
+        self.owner = owner or default_owner()
+        self.conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._import_legacy_log()
+
+    def _import_legacy_log(self):
+        # One-off migration so files listed in processed_files.txt aren't processed again
+        if not os.path.exists(LEGACY_PROCESSED_LOG):
+            return
+        if self.conn.execute("SELECT 1 FROM jobs LIMIT 1").fetchone():
+            return
+        with open(LEGACY_PROCESSED_LOG) as f:
+            names = {line.strip() for line in f if line.strip()}
+        now = time.time()
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO jobs (name, path, state, created_at, finished_at) VALUES (?, ?, 'done', ?, ?)",
+            [(name, name, now, now) for name in names])
+        self.conn.execute("COMMIT")
+
+    def add(self, paths, reset=False):
+        # Returns how many of the paths were new
+        now = time.time()
+        rows = [(os.path.basename(str(p)), str(p), now) for p in paths]
+        self.conn.execute("BEGIN")
+        before = self.conn.total_changes
+        self.conn.executemany("INSERT OR IGNORE INTO jobs (name, path, created_at) VALUES (?, ?, ?)", rows)
+        added = self.conn.total_changes - before
+        if reset:
+            self.conn.executemany(
+                "UPDATE jobs SET state = 'pending', attempts = 0, path = ?, error = NULL WHERE name = ? AND state != 'running'",
+                [(path, name) for name, path, _ in rows])
+        self.conn.execute("COMMIT")
+        return added
+
+    def claim(self, name=None):
+        # Oldest pending job, or a running one whose owner stopped renewing its lease
+        now = time.time()
+        only = " AND name = ?" if name else ""
+        args = (name,) if name else ()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                f"SELECT id FROM jobs WHERE state = 'pending'{only} ORDER BY id LIMIT 1", args).fetchone()
+            if row is None:
+                row = self.conn.execute(
+                    f"SELECT id FROM jobs WHERE state = 'running' AND lease_expires < ?{only} LIMIT 1", (now,) + args).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                "started_at = ?, error = NULL WHERE id = ?",
+                (self.owner, now + LEASE_SECONDS, now, row["id"]))
+            job = dict(self.conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+            self.conn.execute("COMMIT")
+            return job
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def reclaim_orphans(self):
+        # Running jobs leased on this host by processes that have exited (a crashed coordinator)
+        # go back to pending now instead of waiting out their lease. Returns how many.
+        host = socket.gethostname()
+        rows = self.conn.execute(
+            "SELECT id, lease_owner FROM jobs WHERE state = 'running' AND lease_owner LIKE ?", (host + ":%",)).fetchall()
+        orphans = []
+        for row in rows:
+            pid = row["lease_owner"].rpartition(":")[2]
+            if row["lease_owner"] != self.owner and pid.isdigit() and not pid_alive(int(pid)):
+                orphans.append((MAX_ATTEMPTS, time.time(), f"owner {row['lease_owner']} exited", row["id"], row["lease_owner"]))
+        self.conn.executemany(
+            "UPDATE jobs SET state = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+            "lease_owner = NULL, lease_expires = NULL, finished_at = ?, error = ? "
+            "WHERE id = ? AND lease_owner = ? AND state = 'running'", orphans)
+        return len(orphans)
+
+    def leased_elsewhere(self, name=None):
+        # Running jobs whose lease another owner still holds; claim() hands them out once they expire
+        only = " AND name = ?" if name else ""
+        args = (name,) if name else ()
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE state = 'running' AND lease_owner != ? AND lease_expires >= ?{only}",
+            (self.owner, time.time()) + args).fetchone()[0]
+
+    def renew(self, job_ids):
+        expires = time.time() + LEASE_SECONDS
+        self.conn.executemany(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND state = 'running'",
+            [(expires, job_id, self.owner) for job_id in job_ids])
+
+    def complete(self, job_id, frames=None, seconds=None):
+        fps = frames / seconds if frames and seconds else None
+        self.conn.execute(
+            "UPDATE jobs SET state = 'done', lease_owner = NULL, lease_expires = NULL, finished_at = ?, "
+            "frames = ?, seconds = ?, fps = ? WHERE id = ?",
+            (time.time(), frames, seconds, fps, job_id))
+
+    def fail(self, job_id, error):
+        # Back to pending until it has used up its attempts
+        self.conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+            "lease_owner = NULL, lease_expires = NULL, finished_at = ?, error = ? WHERE id = ?",
+            (MAX_ATTEMPTS, time.time(), str(error), job_id))
+
+    def summary(self):
+        rows = self.conn.execute(
+            "SELECT state, COUNT(*) AS jobs, AVG(fps) AS fps, SUM(seconds) AS seconds FROM jobs GROUP BY state")
+        return {row["state"]: dict(row) for row in rows}
+
+    def close(self):
+        self.conn.close()
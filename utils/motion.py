@@ -0,0 +1,107 @@
+# yolo_speed_tracker/utils/motion.py
+import collections
+
+import cv2
+import numpy as np
+
+from .detection import RegionOfInterest
+
+GATE_WIDTH = 160  # frames are compared at this width
+BACKGROUND_RATE = 0.05  # how fast the background model follows the scene
+PIXEL_THRESHOLD = 25  # per-channel change that counts as a changed pixel
+MOTION_FRACTION = 0.002  # share of changed pixels that counts as motion
+HOLD_FRAMES = 30  # keep detecting this long after the last motion
+PRE_ROLL_FRAMES = 5  # gated frames replayed through the tracker when inference wakes up
+
+class MotionGate:
+    # Low-resolution background subtraction deciding whether a frame is worth running detection on
+    def __init__(self, threshold=PIXEL_THRESHOLD, fraction=MOTION_FRACTION, hold_frames=HOLD_FRAMES, rate=BACKGROUND_RATE):
+        self.threshold = threshold
+        self.fraction = fraction
+        self.hold_frames = hold_frames
+        self.rate = rate
+        self.background = None
+        self.hold = 0
+        self.frames = 0
+        self.gated = 0
+
+    def moving(self, frame, band=None):
+        if band is not None:
+            frame = frame[band[0]:band[1]]
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (GATE_WIDTH, max(int(height * GATE_WIDTH / width), 1)), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small.astype(np.float32)
+            return True
+        # Largest change over the colour channels: a red car on grey tarmac barely changes brightness
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background)).max(axis=2)
+        cv2.accumulateWeighted(small, self.background, self.rate)
+        return np.count_nonzero(diff > self.threshold) >= self.fraction * diff.size
+
+    def open(self, frame, band=None):
+        # True when the frame should go to the detector
+        self.frames += 1
+        if self.moving(frame, band):
+            self.hold = self.hold_frames
+        elif self.hold > 0:
+            self.hold -= 1
+        if self.hold > 0:
+            return True
+        self.gated += 1
+        return False
+
+    def gated_fraction(self):
+        return self.gated / self.frames if self.frames else 0.0
+
+    def reset(self):
+        self.background = None
+        self.hold = 0
+
+class GatedDetector:
+    # Runs the wrapped detector only while the gate is open; gated frames get None detections.
+    # On wake-up the last few gated frames are replayed through the detector first so the tracker
+    # has its tracks before the first reported frame, and the frames it never saw are added to its
+    # frame count so tracks lost before the gap expire as they would have.
+    # The gate watches the band around the capture zone (gate_roi, published by the main loop)
+    # whether or not inference itself is cropped, so motion elsewhere doesn't keep it awake.
+    def __init__(self, detector, gate=None, pre_roll=PRE_ROLL_FRAMES):
+        self.detector = detector
+        self.gate = gate or MotionGate()
+        self.gate_roi = RegionOfInterest()
+        self.batch_size = detector.batch_size
+        self.recent = collections.deque(maxlen=pre_roll)
+        self.skipped = 0  # frames since the detector last ran
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def __call__(self, frames):
+        band = self.gate_roi.band
+        first = next((i for i, frame in enumerate(frames) if self.gate.open(frame, band)), None)
+        if first is not None:
+            # Once awake, the rest of the batch goes through so tracking stays continuous
+            for frame in frames[first + 1:]:
+                self.gate.open(frame, band)
+        else:
+            first = len(frames)
+        for frame in frames[:first]:
+            self.recent.append(frame)  # references: nothing draws on the frames it is handed (the preview copies)
+        self.skipped += first
+        detections = [None] * first
+        if first == len(frames):
+            return detections
+
+        warm = list(self.recent)
+        if self.skipped > len(warm):
+            self.detector.advance(self.skipped - len(warm))
+        results = self.detector(warm + list(frames[first:]))
+        self.recent.clear()
+        self.skipped = 0
+        return detections + results[len(warm):]
+
+    def reset(self):
+        self.detector.reset()
+        self.gate.reset()
+        self.recent.clear()
+        self.skipped = 0
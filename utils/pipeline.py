@@ -0,0 +1,153 @@
+# yolo_speed_tracker/utils/pipeline.py
+import queue
+import threading
+
+STOP_POLL_SECONDS = 0.1
+
+class FramePacket:
+    __slots__ = ("index", "frame", "timestamp", "detections")
+
+    def __init__(self, index, frame, timestamp, detections=None):
+        self.index = index
+        self.frame = frame
+        self.timestamp = timestamp
+        self.detections = detections
+
+class StageError:
+    # Carries an exception from a worker thread to the consumer
+    def __init__(self, exc):
+        self.exc = exc
+
+END_OF_STREAM = object()
+
+class FramePipeline:
+    # decode thread -> inference thread -> caller (tracking/speed/output), joined by bounded queues.
+    # queue_size=0 runs every stage inline on the calling thread. detect takes a list of frames
+    # (up to detect.batch_size) and returns one detections entry per frame, in order.
+    # start_index/end_index number the frames when cap was seeked to start_index and stop at end_index.
+    def __init__(self, cap, clock, detect, is_live=False, queue_size=8, start_index=0, end_index=None):
+        self.cap = cap
+        self.clock = clock
+        self.detect = detect
+        self.batch_size = max(getattr(detect, "batch_size", 1), 1)
+        self.is_live = is_live
+        self.queue_size = queue_size
+        self.start_index = start_index
+        self.end_index = end_index
+        self.stop_event = threading.Event()
+        self.decoded = queue.Queue(maxsize=max(queue_size, 1))
+        self.inferred = queue.Queue(maxsize=max(queue_size, 1))
+        self.threads = []
+
+    def read_frames(self):
+        index = self.start_index - 1
+        while not self.stop_event.is_set():
+            if self.end_index is not None and index + 1 >= self.end_index:
+                return
+            ret, frame = self.cap.read()
+            if not ret:
+                if not self.is_live:
+                    return
+                continue
+            index += 1
+            timestamp = self.clock.stamp(self.cap, index)
+            self.clock.throttle(timestamp)
+            yield FramePacket(index, frame, timestamp)
+
+    def _put(self, q, item):
+        # Blocking put is the back-pressure; poll so stop() never deadlocks on a full queue
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=STOP_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=STOP_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return None
+
+    def _detect_batch(self, batch):
+        if batch:
+            for packet, detections in zip(batch, self.detect([packet.frame for packet in batch])):
+                packet.detections = detections
+        return batch
+
+    def _collect_batch(self):
+        # Returns the batch plus END_OF_STREAM / StageError / None (stopped) if the stream ended while filling it
+        batch = []
+        while len(batch) < self.batch_size:
+            item = self._get(self.decoded)
+            if item is None or item is END_OF_STREAM or isinstance(item, StageError):
+                return batch, item
+            batch.append(item)
+        return batch, False
+
+    def _decode_worker(self):
+        try:
+            for packet in self.read_frames():
+                if not self._put(self.decoded, packet):
+                    return
+            self._put(self.decoded, END_OF_STREAM)
+        except Exception as e:
+            self._put(self.decoded, StageError(e))
+
+    def _inference_worker(self):
+        try:
+            while True:
+                batch, end = self._collect_batch()
+                for packet in self._detect_batch(batch):
+                    if not self._put(self.inferred, packet):
+                        return
+                if end is None:
+                    return
+                if end is not False:
+                    self._put(self.inferred, end)
+                    return
+        except Exception as e:
+            self._put(self.inferred, StageError(e))
+
+    def start(self):
+        self.threads = [
+            threading.Thread(target=self._decode_worker, name="decode", daemon=True),
+            threading.Thread(target=self._inference_worker, name="inference", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2)
+
+    def depths(self):
+        return {"decode": self.decoded.qsize(), "inference": self.inferred.qsize()}
+
+    def __iter__(self):
+        if self.queue_size <= 0:
+            batch = []
+            for packet in self.read_frames():
+                batch.append(packet)
+                if len(batch) == self.batch_size:
+                    yield from self._detect_batch(batch)
+                    batch = []
+            yield from self._detect_batch(batch)
+            return
+
+        self.start()
+        expected = self.start_index
+        while True:
+            item = self._get(self.inferred)
+            if item is None or item is END_OF_STREAM:
+                return
+            if isinstance(item, StageError):
+                raise item.exc
+            if item.index != expected:
+                raise RuntimeError(f"Pipeline delivered frame {item.index}, expected {expected}")
+            expected += 1
+            yield item
@@ -0,0 +1,219 @@
+# yolo_speed_tracker/utils/recording.py
+import collections
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from .clock import frame_times_path
+
+RING_SIZE = 64  # frames buffered between the camera reader and the writer (~2 s at 30 fps)
+MAX_READ_FAILURES = 30  # consecutive failed reads before the camera is given up on
+
+class CapturedFrame:
+    __slots__ = ("seq", "frame", "mono", "wall", "interval")
+
+    def __init__(self, seq, frame, mono, wall, interval):
+        self.seq = seq
+        self.frame = frame
+        self.mono = mono
+        self.wall = wall
+        self.interval = interval  # seconds since the previous camera frame, None for the first
+
+class FrameRing:
+    # Bounded FIFO from the camera reader to the writer. When the writer falls behind the oldest
+    # frame is dropped, so the reader never blocks and the camera driver never overflows.
+    def __init__(self, size=RING_SIZE):
+        self.items = collections.deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        # Next frame, or None once the ring is closed and drained (or on timeout)
+        with self.cond:
+            if not self.items and not self.closed:
+                self.cond.wait(timeout)
+            return self.items.popleft() if self.items else None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+class CameraReader:
+    # Drains the camera as fast as it delivers, stamping every frame on arrival. Each frame goes to
+    # the ring and to every consumer (called on this thread, so they must be quick).
+    def __init__(self, cap, ring, consumers=()):
+        self.cap = cap
+        self.ring = ring
+        self.consumers = list(consumers)
+        self.latest = None  # newest frame, for the preview
+        self.captured = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="camera", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        failures = 0
+        last_mono = None
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    failures += 1
+                    if failures >= MAX_READ_FAILURES:
+                        print("⚠️ Failed to read frame.")
+                        return
+                    continue
+                failures = 0
+                mono, wall = time.monotonic(), time.time()
+                item = CapturedFrame(self.captured, frame, mono, wall, None if last_mono is None else mono - last_mono)
+                last_mono = mono
+                self.captured += 1
+                self.latest = item
+                for consumer in self.consumers:
+                    consumer(item)
+                self.ring.put(item)  # last: the writer may burn the timestamp into the frame
+        finally:
+            self.ring.close()
+
+    def alive(self):
+        return self.thread.is_alive()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=2)
+
+class ChunkStats:
+    # Per-chunk counters; dropped frames show up as gaps in the reader's sequence numbers
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.first_seq = None
+        self.last_seq = None
+        self.written = 0
+        self.started = None
+        self.ended = None
+        self.intervals = []
+
+    def add(self, item):
+        if self.first_seq is None:
+            self.first_seq = item.seq
+            self.started = item.wall
+        self.last_seq = item.seq
+        self.ended = item.wall
+        self.written += 1
+        if item.interval is not None:
+            self.intervals.append(item.interval)
+
+    def summary(self):
+        captured = self.last_seq - self.first_seq + 1 if self.first_seq is not None else 0
+        intervals = np.array(self.intervals) * 1000
+        nominal = 1000 / self.fps
+        return {
+            "path": self.path,
+            "started": self.started,
+            "ended": self.ended,
+            "captured": captured,
+            "written": self.written,
+            "dropped": captured - self.written,
+            "interval_ms": {
+                "nominal": round(nominal, 3),
+                "mean": round(float(intervals.mean()), 3) if len(intervals) else None,
+                "std": round(float(intervals.std()), 3) if len(intervals) else None,
+                "p99": round(float(np.percentile(intervals, 99)), 3) if len(intervals) else None,
+                "max": round(float(intervals.max()), 3) if len(intervals) else None,
+            },
+            # Gaps of more than 1.5 frame periods: frames the camera or driver never delivered
+            "late_frames": int(np.count_nonzero(intervals > 1.5 * nominal)),
+        }
+
+def burn_timestamp(frame, wall):
+    # Capture time in the upper-right corner
+    text = datetime.fromtimestamp(wall).strftime("%Y-%m-%d %H:%M:%S")
+    (text_width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+    cv2.putText(frame, text, (frame.shape[1] - text_width - 10, 30), cv2.FONT_HERSHEY_SIMPLEX,
+                0.6, (255, 255, 255), 1, cv2.LINE_AA)
+
+class ChunkWriter:
+    # Writes frames from the ring into fixed-length chunks on its own thread, so a disk stall only
+    # fills the ring. Every frame's capture time goes to <base>.frames.bin (see utils/clock.py);
+    # each finished chunk gets a <base>.stats.json next to it and is passed to on_chunk.
+    def __init__(self, ring, output_dir, fourcc, fps, size, chunk_seconds, on_chunk=None, burn_in=False):
+        self.ring = ring
+        self.output_dir = output_dir
+        self.fourcc = fourcc
+        self.fps = fps
+        self.size = size
+        self.chunk_seconds = chunk_seconds
+        self.on_chunk = on_chunk
+        self.burn_in = burn_in
+        self.chunk_index = 0
+        self.writer = None
+        self.frame_times = None
+        self.stats = None
+        self.thread = threading.Thread(target=self._run, name="writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _open(self, wall):
+        self.chunk_index += 1
+        timestamp = datetime.fromtimestamp(wall).strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.output_dir, f"capture_{self.chunk_index:03d}_{timestamp}.avi")
+        print(f"📹 Starting new recording: {path}")
+        self.writer = cv2.VideoWriter(path, self.fourcc, self.fps, self.size)
+        self.frame_times = open(frame_times_path(path), "wb")
+        self.stats = ChunkStats(path, self.fps)
+
+    def _close(self):
+        if self.writer is None:
+            return
+        self.writer.release()
+        self.frame_times.close()
+        summary = self.stats.summary()
+        base, _ = os.path.splitext(self.stats.path)
+        with open(base + ".stats.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"📊 {os.path.basename(self.stats.path)}: {summary['written']}/{summary['captured']} frames written, "
+              f"{summary['dropped']} dropped, {summary['late_frames']} late")
+        self.writer = None
+        if self.on_chunk:
+            self.on_chunk(self.stats.path, summary)
+
+    def _run(self):
+        try:
+            while True:
+                item = self.ring.get(timeout=0.5)
+                if item is None:
+                    if self.ring.closed and not self.ring.items:
+                        return
+                    continue
+                if self.writer is None or item.wall - self.stats.started >= self.chunk_seconds:
+                    self._close()
+                    self._open(item.wall)
+                if self.burn_in:
+                    burn_timestamp(item.frame, item.wall)
+                self.writer.write(item.frame)
+                self.frame_times.write(struct.pack("<dd", item.mono, item.wall))
+                self.stats.add(item)
+        finally:
+            self._close()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
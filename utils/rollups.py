@@ -0,0 +1,166 @@
+# yolo_speed_tracker/utils/rollups.py
+import collections
+import math
+
+import numpy as np
+
+from .sketch import KLLSketch
+
+# Bucket widths in seconds, aligned to UTC; a time window is answered from the coarsest buckets that fit
+BUCKETS = [("day", 86400), ("hour", 3600), ("minute", 60)]
+MAX_VALID_SPEED = 90  # faster readings count as events but are left out of mean/std/max/quartiles
+REBUILD_CHUNK = 50_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    bucket TEXT NOT NULL,
+    start REAL NOT NULL,
+    class TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    valid_count INTEGER NOT NULL,
+    speed_sum REAL NOT NULL,
+    speed_sum_sq REAL NOT NULL,
+    speed_max REAL,
+    sketch BLOB NOT NULL,
+    PRIMARY KEY (bucket, start, class, direction)
+) WITHOUT ROWID;
+"""
+
+class SpeedSummary:
+    # Mergeable summary of a set of speeds: exact counts, sums and max over the valid speeds,
+    # and a KLL sketch over all of them for quantiles and shares above a threshold
+    def __init__(self, count=0, valid_count=0, speed_sum=0.0, speed_sum_sq=0.0, speed_max=None, sketch=None):
+        self.count = count
+        self.valid_count = valid_count
+        self.speed_sum = speed_sum
+        self.speed_sum_sq = speed_sum_sq
+        self.speed_max = speed_max
+        self.sketch = sketch or KLLSketch()
+
+    @classmethod
+    def from_speeds(cls, speeds):
+        speeds = np.asarray(speeds, dtype=np.float64)
+        valid = speeds[speeds <= MAX_VALID_SPEED]
+        return cls(len(speeds), len(valid), float(valid.sum()), float((valid ** 2).sum()),
+                   float(valid.max()) if len(valid) else None, KLLSketch().update(speeds))
+
+    def merge(self, *others):
+        for other in others:
+            self.count += other.count
+            self.valid_count += other.valid_count
+            self.speed_sum += other.speed_sum
+            self.speed_sum_sq += other.speed_sum_sq
+            if other.speed_max is not None:
+                self.speed_max = other.speed_max if self.speed_max is None else max(self.speed_max, other.speed_max)
+        self.sketch.merge(*[other.sketch for other in others])
+        return self
+
+    @property
+    def mean(self):
+        return self.speed_sum / self.valid_count if self.valid_count else float("nan")
+
+    @property
+    def std(self):
+        # Sample standard deviation, as pandas reports it
+        if self.valid_count < 2:
+            return float("nan")
+        variance = (self.speed_sum_sq - self.speed_sum ** 2 / self.valid_count) / (self.valid_count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def valid_quantiles(self, qs):
+        # Quantiles of the valid speeds: the invalid ones are all above them, so rescale the ranks
+        if not self.valid_count:
+            return np.full(len(qs), np.nan)
+        return self.sketch.quantiles(np.asarray(qs) * self.valid_count / self.count)
+
+    def count_between(self, low, high=None):
+        # Estimated number of speeds in (low, high]
+        if not self.count:
+            return 0
+        upper = 1.0 if high is None else self.sketch.rank(high)
+        return int(round((upper - self.sketch.rank(low)) * self.count))
+
+def bucket_start(timestamp, width):
+    return math.floor(timestamp / width) * width
+
+def _load(row):
+    count, valid_count, speed_sum, speed_sum_sq, speed_max, sketch = row
+    return SpeedSummary(count, valid_count, speed_sum, speed_sum_sq, speed_max, KLLSketch.from_bytes(sketch))
+
+def update_rollups(conn, rows):
+    # Folds event rows (timestamp, object_id, class, speed_kph, direction, ...) into every bucket
+    # size. Runs inside the caller's write transaction.
+    groups = collections.defaultdict(list)
+    for row in rows:
+        timestamp, class_name, speed_kph, direction = row[0], row[2], row[3], row[4] or ""
+        for name, width in BUCKETS:
+            groups[(name, bucket_start(timestamp, width), class_name, direction)].append(speed_kph)
+    for key, speeds in groups.items():
+        summary = SpeedSummary.from_speeds(speeds)
+        existing = conn.execute(
+            "SELECT count, valid_count, speed_sum, speed_sum_sq, speed_max, sketch FROM rollups "
+            "WHERE bucket = ? AND start = ? AND class = ? AND direction = ?", key).fetchone()
+        if existing is not None:
+            summary = _load(existing).merge(summary)
+        conn.execute("INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     key + (summary.count, summary.valid_count, summary.speed_sum, summary.speed_sum_sq,
+                            summary.speed_max, summary.sketch.to_bytes()))
+
+def rebuild_rollups(conn):
+    # One full pass over the events, for stores written before rollups existed
+    conn.execute("DELETE FROM rollups")
+    last_id = 0
+    while True:
+        rows = conn.execute("SELECT id, timestamp, object_id, class, speed_kph, direction FROM events "
+                            "WHERE id > ? ORDER BY id LIMIT ?", (last_id, REBUILD_CHUNK)).fetchall()
+        if not rows:
+            return
+        update_rollups(conn, [row[1:] for row in rows])
+        last_id = rows[-1][0]
+
+def ensure_rollups(conn):
+    # Builds the rollups once if the store has events but no rollups yet
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None and \
+                conn.execute("SELECT 1 FROM events LIMIT 1").fetchone() is not None:
+            print("📈 Building speed rollups from existing events...")
+            rebuild_rollups(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def plan_window(start, end, buckets=BUCKETS):
+    # (bucket, from, to) ranges covering [start, end): whole days in the middle, whole hours and
+    # minutes towards the edges, and the finest buckets rounded outwards
+    name, width = buckets[0]
+    if len(buckets) == 1:
+        return [(name, bucket_start(start, width), math.ceil(end / width) * width)] if start < end else []
+    low, high = math.ceil(start / width) * width, bucket_start(end, width)
+    if low >= high:
+        return plan_window(start, end, buckets[1:])
+    return plan_window(start, low, buckets[1:]) + [(name, low, high)] + plan_window(high, end, buckets[1:])
+
+def query_summary(conn, start=None, end=None, classes=None, direction=None):
+    # SpeedSummary for [start, end) (epoch seconds, None = open) from the rollups
+    if start is None or end is None:
+        first, last = conn.execute("SELECT MIN(start), MAX(start) FROM rollups WHERE bucket = 'minute'").fetchone()
+        if first is None:
+            return SpeedSummary()
+        start = first if start is None else start
+        end = last + 60 if end is None else end
+    filters, args = "", []
+    if classes:
+        filters += f" AND class IN ({', '.join('?' * len(classes))})"
+        args.extend(classes)
+    if direction is not None:
+        filters += " AND direction = ?"
+        args.append(direction)
+    parts = []
+    for name, low, high in plan_window(start, end):
+        parts.extend(_load(row) for row in conn.execute(
+            "SELECT count, valid_count, speed_sum, speed_sum_sq, speed_max, sketch FROM rollups "
+            f"WHERE bucket = ? AND start >= ? AND start < ?{filters}", [name, low, high] + args))
+    return SpeedSummary().merge(*parts)
@@ -0,0 +1,136 @@
+# yolo_speed_tracker/utils/screenshots.py
+import itertools
+import os
+import queue
+import threading
+
+import cv2
+
+from .environment import SCREENSHOT_DIR
+
+SCREENSHOT_MODES = ("full", "crop", "context")
+CROP_MARGIN = 0.25  # extra box width/height kept around a crop
+CONTEXT_SCALE = 0.5  # downscale factor for "context" shots
+
+_sequence = itertools.count()  # shared by every writer in the process
+
+class ScreenshotWriter:
+    # Encodes and writes screenshots on background threads so the tracking loop never waits on imwrite.
+    #   full    - whole frame; several events on the same frame share one encode
+    #   crop    - just the vehicle box plus a margin
+    #   context - downscaled whole frame with the vehicle boxed
+    def __init__(self, directory=SCREENSHOT_DIR, mode="full", image_format="jpg", quality=90,
+                 workers=2, queue_size=32, context_scale=CONTEXT_SCALE):
+        if mode not in SCREENSHOT_MODES:
+            raise ValueError(f"Unknown screenshot mode {mode!r}, expected one of {SCREENSHOT_MODES}")
+        self.directory = directory
+        self.mode = mode
+        self.extension = "." + image_format.lower().lstrip(".")
+        quality_flag = cv2.IMWRITE_WEBP_QUALITY if self.extension == ".webp" else cv2.IMWRITE_JPEG_QUALITY
+        self.params = [quality_flag, int(quality)]
+        self.context_scale = context_scale
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.shared = None  # (frame key, entry) for the frame currently being shared in full mode
+        self.written = 0
+        self.waits = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _filename(self, obj_id, class_name, speed_kph, timestamp):
+        # pid + sequence keep names unique across events in the same second and across worker processes
+        return os.path.join(
+            self.directory,
+            f"{class_name}_id{int(obj_id)}_speed{int(speed_kph)}_{timestamp}_{os.getpid()}_{next(_sequence)}{self.extension}")
+
+    def _crop(self, frame, box):
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = box[:4]
+        margin_x, margin_y = (x2 - x1) * CROP_MARGIN, (y2 - y1) * CROP_MARGIN
+        x1, y1 = max(int(x1 - margin_x), 0), max(int(y1 - margin_y), 0)
+        x2, y2 = min(int(x2 + margin_x), width), min(int(y2 + margin_y), height)
+        return frame[y1:y2, x1:x2].copy()
+
+    def _context(self, frame, box):
+        image = cv2.resize(frame, None, fx=self.context_scale, fy=self.context_scale, interpolation=cv2.INTER_AREA)
+        x1, y1, x2, y2 = (int(v * self.context_scale) for v in box[:4])
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        return image
+
+    def submit(self, frame, frame_key, box, obj_id, class_name, speed_kph, timestamp):
+        # Returns the path the screenshot will be written to. In full mode, consecutive events with the
+        # same frame_key share one encode, so the key must tell frames of different files apart.
+        path = self._filename(obj_id, class_name, speed_kph, timestamp)
+        if self.mode == "full":
+            if frame_key is not None and self.shared is not None and self.shared[0] == frame_key:
+                self._put(("copy", self.shared[1], path))
+                return path
+            entry = {"done": threading.Event(), "data": None}
+            self.shared = (frame_key, entry)
+            self._put(("encode", frame.copy(), path, entry))
+        elif self.mode == "crop":
+            self._put(("encode", self._crop(frame, box), path, None))
+        else:
+            self._put(("encode", self._context(frame, box), path, None))
+        return path
+
+    def _put(self, job):
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                self.waits += 1
+            self.queue.put(job)
+
+    def _write(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+        with self.lock:
+            self.written += 1
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                return
+            try:
+                if job[0] == "encode":
+                    _, image, path, entry = job
+                    data = None
+                    try:
+                        ok, encoded = cv2.imencode(self.extension, image, self.params)
+                        data = encoded.tobytes() if ok else None
+                    finally:
+                        if entry is not None:
+                            entry["data"] = data
+                            entry["done"].set()
+                else:
+                    _, entry, path = job
+                    # Same frame as an earlier event: reuse its encoded bytes
+                    entry["done"].wait()
+                    data = entry["data"]
+                if data is None:
+                    raise RuntimeError(f"Could not encode {path}")
+                self._write(path, data)
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                print(f"⚠️ Screenshot failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        # Blocks until every submitted screenshot is on disk
+        self.queue.join()
+
+    def close(self):
+        # Drains everything queued, then stops the workers
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.waits or self.errors:
+            print(f"📸 {self.written} screenshots written, queue full {self.waits} times, {self.errors} errors")
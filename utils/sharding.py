@@ -0,0 +1,103 @@
+# yolo_speed_tracker/utils/sharding.py
+import os
+
+SHARD_ID_STRIDE = 1_000_000  # unmatched track IDs in shard k become k * stride + local id
+MATCH_IOU = 0.5
+MIN_MATCH_FRAMES = 3
+
+def plan_shards(frame_count, shard_count, overlap):
+    # Contiguous [start, end) frame ranges; shards shorter than a few overlaps aren't worth the warm-up.
+    # The last shard is open-ended (end None), so frames past an under-reported count still get processed.
+    frame_count = int(frame_count)
+    if frame_count <= 0:
+        return []
+    shard_count = max(1, min(shard_count, frame_count // max(overlap * 4, 1)))
+    size = -(-frame_count // shard_count)
+    starts = list(range(0, frame_count, size))
+    return list(zip(starts, starts[1:] + [None]))
+
+class ObservingDetector:
+    # Wraps a detector and keeps the tracked boxes seen in the given frame ranges, for stitching IDs
+    def __init__(self, detector, first_index, ranges):
+        self.detector = detector
+        self.batch_size = detector.batch_size
+        self.next_index = first_index
+        self.ranges = ranges
+        self.observations = {}  # frame index -> [(track id, [x1, y1, x2, y2]), ...]
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
+
+    def __call__(self, frames):
+        detections = self.detector(frames)
+        for result in detections:
+            index = self.next_index
+            self.next_index += 1
+            if result is None or not any(lo <= index < hi for lo, hi in self.ranges):
+                continue
+            ids, boxes, _ = result
+            self.observations[index] = [(int(obj_id), [float(v) for v in box]) for obj_id, box in zip(ids, boxes)]
+        return detections
+
+    def reset(self):
+        self.detector.reset()
+
+def box_iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def match_tracks(prev_observations, observations, frames):
+    # Votes for (current id, previous id) pairs that overlap on the shared frames, then assigns greedily
+    votes = {}
+    for index in frames:
+        for obj_id, box in observations.get(index, []):
+            for prev_id, prev_box in prev_observations.get(index, []):
+                if box_iou(box, prev_box) >= MATCH_IOU:
+                    votes[(obj_id, prev_id)] = votes.get((obj_id, prev_id), 0) + 1
+
+    mapping, used = {}, set()
+    for (obj_id, prev_id), count in sorted(votes.items(), key=lambda item: -item[1]):
+        if count < MIN_MATCH_FRAMES or obj_id in mapping or prev_id in used:
+            continue
+        mapping[obj_id] = prev_id
+        used.add(prev_id)
+    return mapping
+
+def stitch_shards(shards, results, overlap):
+    # Gives every shard's events a file-wide track ID and drops repeat events for a track that
+    # already fired in an earlier shard. Returns (kept, dropped), each sorted by frame index.
+    global_ids = []
+    for k, result in enumerate(results):
+        mapping = {}
+        if k > 0:
+            start = shards[k][0]
+            matches = match_tracks(results[k - 1]["observations"], result["observations"], range(start - overlap, start))
+            mapping = {obj_id: global_ids[k - 1].get(prev_id, (k - 1) * SHARD_ID_STRIDE + prev_id)
+                       for obj_id, prev_id in matches.items()}
+        global_ids.append(mapping)
+
+    events = []
+    for k, result in enumerate(results):
+        for frame_index, obj_id, class_name, speed_kph, timestamp, path, direction in result["events"]:
+            global_id = global_ids[k].get(obj_id, k * SHARD_ID_STRIDE + obj_id)
+            events.append((frame_index, global_id, class_name, speed_kph, timestamp, path, direction))
+    events.sort(key=lambda event: event[0])
+
+    kept, dropped, fired = [], [], set()
+    for event in events:
+        if event[1] in fired:
+            dropped.append(event)
+            continue
+        fired.add(event[1])
+        kept.append(event)
+    return kept, dropped
+
+def discard_screenshots(events):
+    for event in events:
+        try:
+            os.remove(event[5])
+        except OSError:
+            pass
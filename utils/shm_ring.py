@@ -0,0 +1,153 @@
+# yolo_speed_tracker/utils/shm_ring.py
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+SHM_NAME = "speedcatcher_frames"
+SLOTS = 32  # ~1 s of 1080p at 30 fps, ~200 MB of shared memory
+MAX_LAG = SLOTS // 2  # a reader further behind than this skips to the newest frame
+HEADER_FIELDS = 8  # slots, height, width, channels, published count, closed, unused x2
+ALIGN = 64
+OPEN_TIMEOUT = 10.0  # seconds a reader waits for the ring to appear
+READ_TIMEOUT = 5.0  # seconds without a new frame before a reader gives up
+POLL_SECONDS = 0.001
+
+def _layout(slots, shape):
+    # Offsets of the header, per-slot sequence numbers, per-slot (monotonic, wall) times and pixels
+    header = HEADER_FIELDS * 8
+    seqs = header
+    times = seqs + slots * 8
+    data = -(-(times + slots * 16) // ALIGN) * ALIGN
+    return seqs, times, data, data + slots * int(np.prod(shape))
+
+def _attach(name):
+    # Readers must not unlink the writer's segment on exit; Python < 3.13 has no track=False
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class _RingView:
+    def __init__(self, shm, slots, shape):
+        seqs, times, data, _ = _layout(slots, shape)
+        self.shm = shm
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, shm.buf, 0)
+        self.seqs = np.ndarray((slots,), np.int64, shm.buf, seqs)
+        self.times = np.ndarray((slots, 2), np.float64, shm.buf, times)
+        self.data = np.ndarray((slots,) + tuple(shape), np.uint8, shm.buf, data)
+        self.slots = slots
+
+    def release(self):
+        # The numpy views must go before the mapping can be closed
+        self.header = self.seqs = self.times = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a view still referenced elsewhere keeps the mapping alive until it is gone
+
+class SharedFrameRing:
+    # Single-writer ring of raw frames in shared memory. A slot's sequence number is set to -1 while
+    # its pixels are rewritten, and the published count only moves once the slot is complete.
+    def __init__(self, shape, name=SHM_NAME, slots=SLOTS):
+        self.name = name
+        self.shape = tuple(shape)
+        size = _layout(slots, self.shape)[3]
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a capture that crashed
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.view = _RingView(self.shm, slots, self.shape)
+        self.view.seqs[:] = -1
+        self.view.header[:] = 0
+        self.view.header[:4] = (slots,) + self.shape
+        self.published = 0
+
+    def publish(self, frame, mono, wall):
+        view = self.view
+        if view.data is None or frame.shape != self.shape:
+            return False
+        slot = self.published % view.slots
+        view.seqs[slot] = -1
+        view.data[slot] = frame
+        view.times[slot] = (mono, wall)
+        view.seqs[slot] = self.published
+        self.published += 1
+        view.header[4] = self.published
+        return True
+
+    def __call__(self, item):
+        # CameraReader consumer
+        self.publish(item.frame, item.mono, item.wall)
+
+    def close(self):
+        self.view.header[5] = 1  # readers finish instead of waiting out READ_TIMEOUT
+        self.view.release()
+        self.shm.unlink()
+
+class SharedFrameCapture:
+    # Reads a SharedFrameRing with the parts of the cv2.VideoCapture interface the pipeline uses.
+    # Each frame is copied out of its slot: the pipeline keeps frames queued for longer than the
+    # writer takes to come round the ring again. One memcpy still saves the encode/decode.
+    def __init__(self, name=SHM_NAME, max_lag=MAX_LAG, open_timeout=OPEN_TIMEOUT):
+        deadline = time.monotonic() + open_timeout
+        while True:
+            try:
+                self.shm = _attach(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        header = np.ndarray((HEADER_FIELDS,), np.int64, self.shm.buf, 0)
+        slots, height, width, channels = (int(v) for v in header[:4])
+        self.view = _RingView(self.shm, slots, (height, width, channels))
+        self.max_lag = min(max_lag, slots - 1)
+        self.next_seq = max(int(header[4]) - 1, 0)  # start at the newest frame
+        self.frame_time = None  # (monotonic, wall) of the last frame read, stamped by the capture process
+        self.skipped = 0
+
+    def isOpened(self):
+        return self.view is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.view.data.shape[2])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.view.data.shape[1])
+        return 0.0
+
+    def read(self):
+        view = self.view
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            published = int(view.header[4])
+            if published > self.next_seq:
+                if published - self.next_seq > self.max_lag:
+                    self.skipped += published - 1 - self.next_seq
+                    self.next_seq = published - 1
+                slot = self.next_seq % view.slots
+                if view.seqs[slot] == self.next_seq:
+                    frame = view.data[slot].copy()
+                    frame_time = tuple(view.times[slot])
+                    if view.seqs[slot] == self.next_seq:  # not overwritten while we copied
+                        self.frame_time = frame_time
+                        self.next_seq += 1
+                        return True, frame
+                self.next_seq = published  # lapped mid-read; wait for the next one
+            elif view.header[5] or time.monotonic() > deadline:
+                return False, None
+            time.sleep(POLL_SECONDS)
+
+    def release(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
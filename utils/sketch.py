@@ -0,0 +1,90 @@
+# yolo_speed_tracker/utils/sketch.py
+import numpy as np
+
+SKETCH_K = 200  # size of the top compactor; rank error is roughly 1.7 / K
+DECAY = 2 / 3  # each lower compactor holds this share of the one above it
+RNG = np.random.default_rng()
+
+class KLLSketch:
+    # Mergeable streaming quantile sketch (Karnin, Lang & Liberty). An item at level h stands for
+    # 2**h values; a level over capacity is sorted and every other item (random offset) promoted,
+    # so memory stays O(K) however many values go in, and merged sketches summarise both streams.
+    # Up to about K values everything stays at level 0 and answers are exact.
+    def __init__(self, k=SKETCH_K):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+
+    def capacity(self, level):
+        return max(int(self.k * DECAY ** (len(self.levels) - level - 1)), 2)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, *others):
+        # Any number of sketches at once: one concatenation per level, then one compaction pass
+        depth = max([len(self.levels)] + [len(other.levels) for other in others])
+        parts = [[items] for items in self.levels] + [[] for _ in range(depth - len(self.levels))]
+        for other in others:
+            for level, items in enumerate(other.levels):
+                parts[level].append(items)
+            self.count += other.count
+        self.levels = [np.concatenate(level) for level in parts]
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                keep = items[-1:] if len(items) % 2 else items[:0]  # an odd item out waits at this level
+                paired = items[:len(items) - len(keep)]
+                offset = int(RNG.integers(2))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], paired[offset::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        if not self.count:
+            return np.full(len(qs), np.nan)
+        values, cumulative = self._weighted()
+        targets = np.asarray(qs, dtype=np.float64) * cumulative[-1]
+        return values[np.searchsorted(cumulative, targets, side="left").clip(0, len(values) - 1)]
+
+    def rank(self, value):
+        # Share of the values that are <= value
+        if not self.count:
+            return float("nan")
+        values, cumulative = self._weighted()
+        index = np.searchsorted(values, value, side="right")
+        return float(cumulative[index - 1] / cumulative[-1]) if index else 0.0
+
+    def to_bytes(self):
+        # int64 header (k, count, number of levels, level sizes) followed by float32 items
+        header = np.array([self.k, self.count, len(self.levels)] + [len(items) for items in self.levels], dtype=np.int64)
+        return header.tobytes() + np.concatenate(self.levels).astype(np.float32).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        k, count, depth = np.frombuffer(data, dtype=np.int64, count=3)
+        sizes = np.frombuffer(data, dtype=np.int64, count=depth, offset=24)
+        items = np.frombuffer(data, dtype=np.float32, offset=24 + 8 * int(depth)).astype(np.float64)
+        sketch = cls(int(k))
+        sketch.count = int(count)
+        bounds = np.cumsum(sizes).tolist()
+        sketch.levels = [items[a:b] for a, b in zip([0] + bounds[:-1], bounds)]
+        return sketch
@@ -0,0 +1,32 @@
+# yolo_speed_tracker/utils/startup.py
+import time
+
+import numpy as np
+
+from .detection import model_options
+
+WARMUP_SHAPE = (1080, 1920, 3)  # the capture size initialize_video_source asks for
+WARMUP_RUNS = 2
+
+class StartupTimer:
+    # Named startup phases, printed as one line once everything is ready
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self, label="Startup"):
+        parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+        print(f"⏱️ {label}: {parts} (total {self.last - self.started:.2f}s)")
+        return dict(self.phases)
+
+def warm_up(model, classes=None, imgsz=None, runs=WARMUP_RUNS):
+    # A few inferences on a blank frame so graph setup and allocations aren't paid on the first real frame.
+    # predict (not track) leaves no tracker state behind.
+    frame = np.zeros(WARMUP_SHAPE, dtype=np.uint8)
+    for _ in range(runs):
+        model.predict(frame, verbose=False, classes=classes, **model_options(imgsz))
@@ -0,0 +1,118 @@
+# yolo_speed_tracker/utils/track_state.py
+import numpy as np
+
+SPEED_HISTORY = 32  # most recent speeds kept per track
+IDLE_SECONDS = 5.0  # a track not seen for this long is finalized and its slot reused
+INITIAL_CAPACITY = 64
+
+class TrackStore:
+    # Per-track state in fixed-width NumPy columns, one row ("slot") per live track.
+    # Slots of idle tracks go back on a free list, so memory follows the number of
+    # tracks on screen at once rather than the number seen since start-up.
+    def __init__(self, history=SPEED_HISTORY, idle_seconds=IDLE_SECONDS, capacity=INITIAL_CAPACITY, on_finalize=None):
+        self.history_size = history
+        self.idle_seconds = idle_seconds
+        self.on_finalize = on_finalize  # on_finalize(obj_id, summary) as each track leaves
+        self.slots = {}  # track id -> slot
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.center = np.zeros((capacity, 2))
+        self.box = np.zeros((capacity, 4))
+        self.first_seen = np.zeros(capacity)
+        self.last_time = np.zeros(capacity)
+        self.max_speed = np.zeros(capacity)
+        self.fired = np.zeros(capacity, dtype=bool)
+        self.history = np.zeros((capacity, history))
+        self.history_count = np.zeros(capacity, dtype=np.int64)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.finalized = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, obj_id):
+        return int(obj_id) in self.slots
+
+    def get(self, obj_id):
+        return self.slots.get(int(obj_id))
+
+    def lookup(self, ids):
+        # Slot for each track id, -1 where the id has no slot yet
+        return np.fromiter((self.slots.get(obj_id, -1) for obj_id in np.asarray(ids, dtype=np.int64).tolist()),
+                           dtype=np.int64, count=len(ids))
+
+    def _grow(self):
+        capacity = len(self.ids)
+        for name in ("ids", "center", "box", "first_seen", "last_time", "max_speed", "fired", "history", "history_count"):
+            column = getattr(self, name)
+            grown = np.zeros((capacity * 2,) + column.shape[1:], dtype=column.dtype)
+            grown[:capacity] = column
+            setattr(self, name, grown)
+        self.ids[capacity:] = -1
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def add(self, obj_id, center, box, timestamp):
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.slots[int(obj_id)] = slot
+        self.ids[slot] = int(obj_id)
+        self.center[slot] = center
+        self.box[slot] = box[:4]
+        self.first_seen[slot] = self.last_time[slot] = timestamp
+        self.max_speed[slot] = 0.0
+        self.fired[slot] = False
+        self.history_count[slot] = 0
+        return slot
+
+    def update(self, slot, center, box, timestamp, speed_kph):
+        self.center[slot] = center
+        self.box[slot] = box[:4]
+        self.last_time[slot] = timestamp
+        self.max_speed[slot] = max(self.max_speed[slot], speed_kph)
+        self.history[slot, self.history_count[slot] % self.history_size] = speed_kph
+        self.history_count[slot] += 1
+
+    def update_many(self, slots, centers, boxes, timestamp, speeds):
+        # update() for an array of slots at once
+        self.center[slots] = centers
+        self.box[slots] = boxes[:, :4]
+        self.last_time[slots] = timestamp
+        self.max_speed[slots] = np.maximum(self.max_speed[slots], speeds)
+        self.history[slots, self.history_count[slots] % self.history_size] = speeds
+        self.history_count[slots] += 1
+
+    def speeds(self, slot):
+        # Speed history of a track, oldest first
+        count = self.history_count[slot]
+        if count <= self.history_size:
+            return self.history[slot, :count].copy()
+        return np.roll(self.history[slot], -(count % self.history_size))
+
+    def summary(self, slot):
+        speeds = self.speeds(slot)
+        return {
+            "first_seen": float(self.first_seen[slot]),
+            "last_seen": float(self.last_time[slot]),
+            "max_speed": float(self.max_speed[slot]),
+            "median_speed": float(np.median(speeds)) if len(speeds) else 0.0,
+            "fired": bool(self.fired[slot]),
+        }
+
+    def _release(self, slots):
+        for slot in slots:
+            obj_id = int(self.ids[slot])
+            if self.on_finalize is not None:
+                self.on_finalize(obj_id, self.summary(slot))
+            del self.slots[obj_id]
+            self.ids[slot] = -1
+            self.free.append(slot)
+            self.finalized += 1
+
+    def evict_idle(self, now):
+        # Finalizes every track not updated within idle_seconds of `now`; returns how many left
+        stale = np.flatnonzero((self.ids >= 0) & (self.last_time < now - self.idle_seconds))
+        self._release(stale.tolist())
+        return len(stale)
+
+    def finalize_all(self):
+        self._release(list(self.slots.values()))
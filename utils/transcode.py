@@ -0,0 +1,103 @@
+# yolo_speed_tracker/utils/transcode.py
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+# codec -> (ffmpeg video options, extension, container); None keeps the MJPG .avi as recorded
+CODECS = {
+    "prores": (["-c:v", "prores_ks", "-pix_fmt", "yuv422p10le"], ".mov", "mov"),
+    "h264": (["-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-pix_fmt", "yuv420p"], ".mp4", "mp4"),
+    "mjpg": None,
+}
+MAX_PENDING = 3  # chunks waiting for a transcoder; beyond this a chunk is kept as MJPG
+WORKERS = 1
+FFMPEG_THREADS = 2  # leave the remaining cores to the recorder
+NICENESS = 19
+
+def low_priority_command(cmd):
+    # nice for CPU, and the idle IO class where ionice exists: disk bandwidth is what the recorder is short of
+    if shutil.which("ionice"):
+        cmd = ["ionice", "-c3"] + cmd
+    if shutil.which("nice"):
+        cmd = ["nice", "-n", str(NICENESS)] + cmd
+    return cmd
+
+def low_priority_options():
+    if os.name == "nt":
+        return {"creationflags": subprocess.IDLE_PRIORITY_CLASS}
+    return {}
+
+def transcode(source, codec):
+    # ffmpeg into <base><ext>.inprogress, renamed into place only once complete, then the source is
+    # deleted. Returns the final path, or None if ffmpeg failed (the source is left untouched).
+    options, ext, container = CODECS[codec]
+    base, _ = os.path.splitext(source)
+    final_path = base + ext
+    temp_path = final_path + ".inprogress"
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-i", source, "-threads", str(FFMPEG_THREADS)] + options + [
+        "-an", "-f", container, temp_path]  # the .inprogress suffix hides the container from ffmpeg
+    print(f"🎞️ Converting {source} → {final_path}")
+    try:
+        subprocess.run(low_priority_command(cmd), check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.STDOUT, **low_priority_options())
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"❌ Failed to convert {source}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+    os.replace(temp_path, final_path)
+    os.remove(source)
+    print(f"🗑️ Deleted original: {source}")
+    return final_path
+
+class TranscodePool:
+    # A few low-priority ffmpeg workers behind a bounded queue. on_done(path) is called with the file
+    # to process once it is final: the transcoded file, or the original when transcoding is off,
+    # the queue is full or ffmpeg failed.
+    def __init__(self, codec="h264", workers=WORKERS, max_pending=MAX_PENDING, on_done=None):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}, expected one of {tuple(CODECS)}")
+        self.codec = codec
+        self.on_done = on_done
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.skipped = 0
+        self.threads = []
+        if CODECS[codec] is not None:
+            for i in range(workers):
+                thread = threading.Thread(target=self._run, name=f"transcode-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, path):
+        # Never blocks: it is called from the recorder's writer thread
+        if not self.threads:
+            self._done(path)
+            return
+        try:
+            self.jobs.put_nowait(path)
+        except queue.Full:
+            self.skipped += 1
+            print(f"⚠️ Transcode queue full, keeping {path} as recorded")
+            self._done(path)
+
+    def _run(self):
+        while True:
+            path = self.jobs.get()
+            if path is None:
+                return
+            self._done(transcode(path, self.codec) or path)
+
+    def _done(self, path):
+        if self.on_done:
+            self.on_done(path)
+
+    def close(self):
+        # Finishes the queued chunks before returning
+        if self.jobs.qsize():
+            print(f"⏳ Waiting for {self.jobs.qsize()} pending transcode(s)...")
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()